@@ -1,8 +1,15 @@
 import streamlit as st
-import requests
 import pandas as pd
-import time
-import io
+
+import opendata
+from opendata import config, metrics
+from opendata.api import FetchError
+from opendata.compact import drop_id
+from opendata.export import EXPORT_FORMATS, PARQUET_COMPRESSIONS, FrameExport, export_writer, find_geometry, gpd
+from opendata.preview import PREVIEW_FORMATS, PreviewUnavailable, preview_file
+from opendata.profile import profile_frame, profile_store
+from opendata.search import CatalogIndex, SearchIndex
+from opendata.store import STORE_FORMATS, DiskFrame, store_writer
 
 st.set_page_config(
     page_title="Montréal Open Data Explorer",
@@ -40,17 +47,30 @@ TRANSLATIONS = {
         "res_name": "Name", "res_format": "Format", "res_id": "Resource ID",
         "fetch_this": "Select a resource to fetch",
         "preview_header": "🔎 Preview", "download_header": "⬇️ Download",
-        "download_btn": "📥 Download as CSV",
+        "download_btn": "📥 Download as {fmt}",
+        "export_format": "Format", "export_compression": "Compression",
+        "geoparquet_unavailable": "A geometry column was detected — install `geopandas` to enable GeoParquet export.",
         "download_btn_raw": "📥 Download {fmt} file",
         "download_caption": "File: `{filename}`",
         "download_link_label": "🔗 Open / Download {fmt} file (external link)",
         "download_link_caption": "Large file — opens directly in your browser or triggers a download.",
         "rows_fetched": "Rows fetched", "columns": "Columns", "est_memory": "Est. memory",
+        "memory_compacted": "-{pct:.0%} vs {before} KB as fetched",
         "filter_label": "Filter rows",
         "filter_caption": "Showing {shown} of {total} rows",
+        "filter_caption_store": "{matches} of {total} rows match — showing the first {shown}",
+        "on_disk": "On disk", "preview_page": "Page",
+        "window_caption": "Rows {start}–{stop} of {total}",
+        "out_of_core": "Out-of-core mode",
+        "out_of_core_help": (
+            "Stream pages to Parquet files on disk instead of memory. Preview, filtering, "
+            "column information and export read from disk, so any size can be fetched."
+        ),
+        "filter_column": "In column", "filter_all_columns": "All columns",
         "col_info_expander": "📋 Column information",
         "col_name": "Column", "col_nonnull": "Non-null", "col_null": "Null",
         "col_dtype": "Dtype", "col_sample": "Sample",
+        "col_distinct": "Distinct (≈)", "col_min": "Min", "col_max": "Max", "col_top": "Top values",
         "fetcher_title": "🔍 Fetch by Resource ID",
         "fetcher_subtitle": "Enter any Resource ID from the Montréal Open Data portal to preview and download the dataset.",
         "resource_id_label": "Resource ID",
@@ -78,6 +98,11 @@ TRANSLATIONS = {
             "4. Copy the UUID from the URL: `.../resource/<resource-id>`"
         ),
         "progress_text": "Fetched {fetched} / {total} records…",
+        "cancel_fetch_btn": "⏹️ Cancel and keep the rows fetched so far",
+        "live_preview_caption": "Live preview of the first {shown} rows; the table grows as pages arrive.",
+        "partial_info": "Fetch cancelled: these are the rows that arrived before it was stopped.",
+        "fetch_cancelled_empty": "Fetch cancelled before any rows arrived.",
+        "fetch_cancelled_done": "The fetch had already finished; fetch again to load it from the cache.",
         "language_toggle": "🇫🇷 Français",
         "dataset_header": "📂 Dataset",
         "loading_total": "Checking total record count…",
@@ -87,8 +112,31 @@ TRANSLATIONS = {
         "fetch_all_warning": "Fetching all {total:,} rows may take a while depending on dataset size.",
         "non_csv_info": "ℹ️ This resource is in **{fmt}** format and cannot be previewed in-app. You can download it directly below.",
         "non_csv_fetcher_info": "ℹ️ This Resource ID points to a **{fmt}** file. Direct preview is not available — you can download it below.",
+        "file_preview_info": "ℹ️ This **{fmt}** file is not in the datastore. Its first rows can be previewed from the file itself, or you can download it below.",
+        "file_preview_rows": "Rows to preview",
+        "file_preview_btn": "👁️ Preview file",
+        "file_preview_spinner": "Reading the file…",
+        "file_preview_missing": "ℹ️ Previewing {fmt} files needs the optional `{package}` package (`pip install {package}`). You can still download the file below.",
         "checking_resource": "Checking resource type…",
         "unknown_format": "UNKNOWN",
+        "query_expander": "🎯 Server-side query (optional)",
+        "query_mode": "Query mode", "query_mode_filters": "Filters", "query_mode_sql": "SQL",
+        "query_columns": "Columns to fetch (all if empty)",
+        "query_text": "Full-text search",
+        "query_filter_col": "Filter column",
+        "query_filter_val": "Equals (comma-separated for several values)",
+        "query_sort": "Sort by", "query_desc": "Descending",
+        "query_sql": "SQL statement (datastore_search_sql)",
+        "query_sql_help": "Use the resource ID as the table name. Pages follow your ORDER BY, which must name returned "
+                          "columns, then _id (or the whole row when _id is not selected) so they never overlap.",
+        "cache_stats": "💾 Cache: {hits} hit(s) · {misses} miss(es) · {entries} resource(s), {size:.1f} MB",
+        "admin_expander": "📈 Pipeline metrics",
+        "admin_no_requests": "No portal requests yet.",
+        "admin_cache": "{cache} cache: {lookups} lookup(s), {ratio:.0f}% served locally",
+        "admin_flights": "Shared fetches: {leaders} started, {followers} joined in flight, {cancelled} cancelled",
+        "admin_fetch_peak": "Largest in-memory fetch peak: ≤ {size:.1f} MB",
+        "admin_rss": "Process peak memory: {size:.1f} MB",
+        "admin_endpoint": "Prometheus metrics on port {port} at /metrics",
     },
     "fr": {
         "page_title": "🗺️ Explorateur – Données ouvertes de Montréal",
@@ -119,17 +167,30 @@ TRANSLATIONS = {
         "res_name": "Nom", "res_format": "Format", "res_id": "Identifiant de ressource",
         "fetch_this": "Sélectionnez une ressource",
         "preview_header": "🔎 Aperçu", "download_header": "⬇️ Téléchargement",
-        "download_btn": "📥 Télécharger en CSV",
+        "download_btn": "📥 Télécharger en {fmt}",
+        "export_format": "Format", "export_compression": "Compression",
+        "geoparquet_unavailable": "Une colonne géométrique a été détectée — installez `geopandas` pour activer l'export GeoParquet.",
         "download_btn_raw": "📥 Télécharger le fichier {fmt}",
         "download_caption": "Fichier : `{filename}`",
         "download_link_label": "🔗 Ouvrir / Télécharger le fichier {fmt} (lien externe)",
         "download_link_caption": "Fichier volumineux — s'ouvre directement dans votre navigateur ou déclenche un téléchargement.",
         "rows_fetched": "Lignes récupérées", "columns": "Colonnes", "est_memory": "Mémoire estimée",
+        "memory_compacted": "-{pct:.0%} par rapport à {before} Ko à la réception",
         "filter_label": "Filtrer les lignes",
         "filter_caption": "Affichage de {shown} lignes sur {total}",
+        "filter_caption_store": "{matches} lignes sur {total} correspondent — affichage des {shown} premières",
+        "on_disk": "Sur disque", "preview_page": "Page",
+        "window_caption": "Lignes {start} à {stop} sur {total}",
+        "out_of_core": "Mode hors mémoire",
+        "out_of_core_help": (
+            "Écrire les pages dans des fichiers Parquet sur disque plutôt qu'en mémoire. L'aperçu, le filtre, "
+            "les informations sur les colonnes et l'export lisent le disque : aucune limite de taille."
+        ),
+        "filter_column": "Dans la colonne", "filter_all_columns": "Toutes les colonnes",
         "col_info_expander": "📋 Informations sur les colonnes",
         "col_name": "Colonne", "col_nonnull": "Non-nul", "col_null": "Nul",
         "col_dtype": "Type", "col_sample": "Exemple",
+        "col_distinct": "Distinctes (≈)", "col_min": "Min", "col_max": "Max", "col_top": "Valeurs fréquentes",
         "fetcher_title": "🔍 Récupérer par identifiant de ressource",
         "fetcher_subtitle": (
             "Entrez n'importe quel identifiant de ressource du portail de données ouvertes de Montréal "
@@ -160,6 +221,11 @@ TRANSLATIONS = {
             "4. Copiez l'UUID dans l'URL : `.../resource/<identifiant>`"
         ),
         "progress_text": "Récupéré {fetched} / {total} enregistrements…",
+        "cancel_fetch_btn": "⏹️ Annuler et garder les lignes déjà récupérées",
+        "live_preview_caption": "Aperçu en direct des {shown} premières lignes; le tableau s'allonge à l'arrivée des pages.",
+        "partial_info": "Récupération annulée : voici les lignes arrivées avant l'arrêt.",
+        "fetch_cancelled_empty": "Récupération annulée avant l'arrivée de la moindre ligne.",
+        "fetch_cancelled_done": "La récupération était déjà terminée; relancez-la pour la charger depuis le cache.",
         "language_toggle": "🇬🇧 English",
         "dataset_header": "📂 Jeu de données",
         "loading_total": "Vérification du nombre total d'enregistrements…",
@@ -169,8 +235,32 @@ TRANSLATIONS = {
         "fetch_all_warning": "Récupérer les {total:,} lignes peut prendre du temps selon la taille du jeu de données.",
         "non_csv_info": "ℹ️ Cette ressource est au format **{fmt}** et ne peut pas être prévisualisée dans l'application. Vous pouvez la télécharger directement ci-dessous.",
         "non_csv_fetcher_info": "ℹ️ Cet identifiant pointe vers un fichier **{fmt}**. L'aperçu n'est pas disponible — vous pouvez le télécharger ci-dessous.",
+        "file_preview_info": "ℹ️ Ce fichier **{fmt}** n'est pas dans le datastore. Ses premières lignes peuvent être prévisualisées à partir du fichier lui-même, ou vous pouvez le télécharger ci-dessous.",
+        "file_preview_rows": "Lignes à prévisualiser",
+        "file_preview_btn": "👁️ Prévisualiser le fichier",
+        "file_preview_spinner": "Lecture du fichier…",
+        "file_preview_missing": "ℹ️ L'aperçu des fichiers {fmt} nécessite le paquet optionnel `{package}` (`pip install {package}`). Vous pouvez tout de même télécharger le fichier ci-dessous.",
         "checking_resource": "Vérification du type de ressource…",
         "unknown_format": "INCONNU",
+        "query_expander": "🎯 Requête côté serveur (facultatif)",
+        "query_mode": "Mode de requête", "query_mode_filters": "Filtres", "query_mode_sql": "SQL",
+        "query_columns": "Colonnes à récupérer (toutes si vide)",
+        "query_text": "Recherche plein texte",
+        "query_filter_col": "Colonne à filtrer",
+        "query_filter_val": "Égale à (plusieurs valeurs séparées par des virgules)",
+        "query_sort": "Trier par", "query_desc": "Décroissant",
+        "query_sql": "Requête SQL (datastore_search_sql)",
+        "query_sql_help": "Utilisez l'identifiant de ressource comme nom de table. Les pages suivent votre ORDER BY, "
+                          "qui doit nommer des colonnes retournées, puis _id (ou la ligne entière sans _id) pour ne "
+                          "jamais se chevaucher.",
+        "cache_stats": "💾 Cache : {hits} succès · {misses} échec(s) · {entries} ressource(s), {size:.1f} Mo",
+        "admin_expander": "📈 Métriques du pipeline",
+        "admin_no_requests": "Aucune requête au portail pour l'instant.",
+        "admin_cache": "Cache {cache} : {lookups} consultation(s), {ratio:.0f} % servies localement",
+        "admin_flights": "Récupérations partagées : {leaders} lancée(s), {followers} jointe(s) en cours, {cancelled} annulée(s)",
+        "admin_fetch_peak": "Pic mémoire de la plus grosse récupération : ≤ {size:.1f} Mo",
+        "admin_rss": "Pic mémoire du processus : {size:.1f} Mo",
+        "admin_endpoint": "Métriques Prometheus sur le port {port}, chemin /metrics",
     },
 }
 
@@ -182,20 +272,23 @@ if "fetched_df"      not in st.session_state: st.session_state.fetched_df      =
 if "last_pkg_title"  not in st.session_state: st.session_state.last_pkg_title  = None
 if "last_res_label"  not in st.session_state: st.session_state.last_res_label  = None
 if "res_total_count" not in st.session_state: st.session_state.res_total_count = None
+if "fetched_artifacts" not in st.session_state: st.session_state.fetched_artifacts = {}
+if "fetched_partial" not in st.session_state: st.session_state.fetched_partial = False
+if "partial_fetch"   not in st.session_state: st.session_state.partial_fetch   = None
+if "fetch_cancelled" not in st.session_state: st.session_state.fetch_cancelled = False
 
 def t(key): return TRANSLATIONS[st.session_state.lang][key]
 
-BASE_URL         = "https://donnees.montreal.ca/api/3/action/datastore_search"
-PACKAGE_SEARCH   = "https://donnees.montreal.ca/api/3/action/package_search"
-PACKAGE_URL      = "https://donnees.montreal.ca/api/3/action/resource_show"
-MAX_RETRIES      = 5
-PAGE_SIZE        = 1_000
-CSV_FORMATS      = {"CSV", "TSV", "XLS", "XLSX"}
 LINK_ONLY_FORMATS = {"ZIP", "SHP", "RAR", "7Z", "TAR", "GZ"}
 SLIDER_THRESHOLD = 101
+PREVIEW_ROWS     = 1_000
 
 def is_tabular(fmt: str) -> bool:
-    return fmt.upper() in CSV_FORMATS
+    return fmt.upper() in config.CSV_FORMATS
+
+def in_datastore(fmt: str, datastore_active) -> bool:
+    """Whether to page through the datastore; unknown status falls back to the format."""
+    return bool(datastore_active) if datastore_active is not None else is_tabular(fmt)
 
 def is_link_only(fmt: str) -> bool:
     """Large binary formats — never buffer through Streamlit memory."""
@@ -217,49 +310,28 @@ def safe_slider(total: int):
         key="browser_row_slider",
     )
 
-@st.cache_data(ttl=3600, show_spinner=False)
-def load_catalog():
-    all_packages = []
-    start, rows  = 0, 100
-    while True:
-        try:
-            resp = requests.get(PACKAGE_SEARCH,
-                params={"rows": rows, "start": start, "sort": "metadata_modified desc"},
-                timeout=30)
-            resp.raise_for_status()
-            data = resp.json()
-            if not data.get("success"): break
-            results = data["result"]["results"]
-            if not results: break
-            all_packages.extend(results)
-            start += len(results)
-            if start >= data["result"]["count"]: break
-            time.sleep(0.2)
-        except Exception: break
-    return all_packages
+@st.cache_resource(show_spinner=False)
+def start_metrics():
+    """The metrics endpoint and log sink configured in the environment, started once per server."""
+    metrics.serve_from_env()
+
+@st.cache_resource(ttl=3600, show_spinner=False)
+def load_catalog_index():
+    """The catalog and its search index, refreshed together."""
+    return CatalogIndex(opendata.load_catalog())
 
 @st.cache_data(ttl=600, show_spinner=False)
 def get_resource_total(resource_id):
-    try:
-        resp = requests.get(BASE_URL,
-            params={"resource_id": resource_id, "limit": 1, "offset": 0}, timeout=20)
-        resp.raise_for_status()
-        data = resp.json()
-        if data.get("success"): return data["result"]["total"]
-    except Exception: pass
-    return None
+    return opendata.get_resource_total(resource_id)
+
+@st.cache_data(ttl=600, show_spinner=False)
+def get_resource_fields(resource_id):
+    """Column names of a datastore resource, for the query builder."""
+    return opendata.get_resource_fields(resource_id)
 
 @st.cache_data(ttl=600, show_spinner=False)
 def get_resource_meta(resource_id):
-    try:
-        resp = requests.get(PACKAGE_URL, params={"id": resource_id}, timeout=15)
-        resp.raise_for_status()
-        data = resp.json()
-        if data.get("success"):
-            r = data["result"]
-            return (r.get("format", ""), r.get("url", ""), r.get("name", resource_id))
-    except Exception: pass
-    return ("", "", resource_id)
+    return opendata.get_resource_meta(resource_id)
 
 def render_external_link(url: str, fmt: str):
     """Direct hyperlink for large binary files — avoids loading into Streamlit memory."""
@@ -276,118 +348,335 @@ def render_external_link(url: str, fmt: str):
 def download_raw_file(url: str, filename: str, fmt: str):
     """
     For large binary formats (ZIP/SHP/etc.) → render a direct external link.
-    For smaller files → buffer and offer as a Streamlit download button.
+    For smaller files → stream into the shared file cache and offer it as a
+    Streamlit download button; reruns reuse the cached copy.
     """
     if is_link_only(fmt):
         render_external_link(url, fmt)
         return
     try:
         with st.spinner(t("downloading_spinner")):
-            resp = requests.get(url, timeout=60)
-            resp.raise_for_status()
-            file_bytes = resp.content
-        mime_map = {
-            "JSON": "application/json", "GEOJSON": "application/geo+json",
-            "XML": "application/xml", "KML": "application/vnd.google-earth.kml+xml",
-            "PDF": "application/pdf", "XLS": "application/vnd.ms-excel",
-            "XLSX": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        }
-        mime = mime_map.get(fmt.upper(), "application/octet-stream")
-        st.download_button(
-            label=t("download_btn_raw").format(fmt=fmt.upper()),
-            data=file_bytes, file_name=filename, mime=mime,
-            use_container_width=True, type="primary",
-        )
-        st.caption(t("download_caption").format(filename=filename))
-    except Exception:
+            path = opendata.shared_file_cache().fetch(url)
+    except FetchError:
         st.error(t("download_error"))
+        return
+    mime_map = {
+        "JSON": "application/json", "GEOJSON": "application/geo+json",
+        "XML": "application/xml", "KML": "application/vnd.google-earth.kml+xml",
+        "PDF": "application/pdf", "XLS": "application/vnd.ms-excel",
+        "XLSX": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    }
+    mime = mime_map.get(fmt.upper(), "application/octet-stream")
+    # The file is only read when the button is clicked.
+    st.download_button(
+        label=t("download_btn_raw").format(fmt=fmt.upper()),
+        data=path.read_bytes, file_name=filename, mime=mime,
+        use_container_width=True, type="primary",
+    )
+    st.caption(t("download_caption").format(filename=filename))
 
-def fetch_page(resource_id, offset=0, limit=PAGE_SIZE):
-    params = {"resource_id": resource_id, "limit": limit, "offset": offset}
-    base_wait = 5
-    for attempt in range(MAX_RETRIES):
-        try:
-            resp = requests.get(BASE_URL, params=params, timeout=60)
-            if resp.status_code == 429:
-                time.sleep(base_wait * (2 ** attempt))
-                continue
-            resp.raise_for_status()
-            return resp.json()
-        except requests.RequestException:
-            if attempt < MAX_RETRIES - 1:
-                time.sleep(base_wait * (2 ** attempt))
-    return None
-
-def fetch_all_records(resource_id, max_rows=None):
-    all_records  = []
-    total        = None
-    offset       = 0
+def run_fetch(fetch):
+    """
+    Run a loader from the opendata package behind a progress bar. `fetch`
+    receives the progress callback; failures and empty results are reported
+    here and come back as None.
+    """
     progress_bar = st.progress(0, text=t("progress_text").format(fetched=0, total="?"))
-    while True:
-        data = fetch_page(resource_id, offset=offset)
-        if data is None or not data.get("success"):
-            st.error(t("error_msg"))
-            progress_bar.empty()
-            return None
-        result = data["result"]
-        if total is None: total = result["total"]
-        records = result["records"]
-        if not records: break
-        all_records.extend(records)
-        fetched = len(all_records)
-        pct = min(int(fetched / total * 100), 100) if total > 0 else 100
-        progress_bar.progress(pct,
-            text=t("progress_text").format(fetched=f"{fetched:,}", total=f"{total:,}"))
-        offset += len(records)
-        if max_rows and fetched >= max_rows:
-            all_records = all_records[:max_rows]
-            break
-        if offset >= total: break
-        time.sleep(0.3)
-    progress_bar.empty()
-    if not all_records:
+
+    def update(fetched, total):
+        pct = min(int(fetched / total * 100), 100) if total else (100 if total == 0 else 0)
+        progress_bar.progress(pct, text=t("progress_text").format(
+            fetched=f"{fetched:,}", total="?" if total is None else f"{total:,}"))
+
+    try:
+        df = fetch(update)
+    except FetchError:
+        st.error(t("error_msg"))
+        return None
+    finally:
+        progress_bar.empty()
+    if df is None or df.empty:
         st.warning(t("no_records"))
         return None
-    df = pd.DataFrame(all_records)
-    if "_id" in df.columns and len(df.columns) > 1:
-        df = df.drop(columns=["_id"])
     return df
 
+
+def preview_resource(resource_id, name, url, fmt, max_rows):
+    """Parse the first rows of a file resource into the fetched frame; False if the format's parser is missing."""
+    try:
+        with st.spinner(t("file_preview_spinner")):
+            df = run_fetch(lambda progress: preview_file(url, fmt, max_rows=max_rows))
+    except PreviewUnavailable as e:
+        st.info(t("file_preview_missing").format(fmt=fmt, package=e.args[0]))
+        return False
+    if df is not None:
+        store_fetched(resource_id, name, df)
+    return True
+
+
+def render_admin_panel():
+    """Pipeline metrics for operators, shown in the sidebar when MTL_ADMIN_PANEL is set."""
+    summary = metrics.summary()
+    with st.expander(t("admin_expander")):
+        if summary["endpoints"]:
+            st.dataframe(pd.DataFrame(summary["endpoints"]), use_container_width=True, hide_index=True)
+        else:
+            st.caption(t("admin_no_requests"))
+        for name, cache in summary["caches"].items():
+            st.caption(t("admin_cache").format(cache=name, lookups=cache["lookups"],
+                                               ratio=(cache["hit_ratio"] or 0) * 100))
+        flights = summary["flights"]
+        st.caption(t("admin_flights").format(leaders=flights.get("leader", 0), followers=flights.get("follower", 0),
+                                             cancelled=flights.get("cancelled", 0)))
+        if summary["fetch_peak_max"]:
+            st.caption(t("admin_fetch_peak").format(size=summary["fetch_peak_max"] / 1024 ** 2))
+        if summary["peak_rss"]:
+            st.caption(t("admin_rss").format(size=summary["peak_rss"] / 1024 ** 2))
+        if config.METRICS_PORT:
+            st.caption(t("admin_endpoint").format(port=config.METRICS_PORT))
+
+
+def drop_fetched():
+    """Forget the fetched frame, deleting its export files and out-of-core parts."""
+    for artifact in st.session_state.fetched_artifacts.values():
+        if isinstance(artifact, FrameExport): artifact.discard()
+    if isinstance(st.session_state.fetched_df, DiskFrame):
+        st.session_state.fetched_df.discard()
+    st.session_state.fetched_df        = None
+    st.session_state.fetched_artifacts = {}
+    st.session_state.fetched_partial   = False
+
+def store_fetched(resource_id, name, df, partial=False):
+    """Keep a fetched frame across reruns; objects derived from it are rebuilt lazily."""
+    drop_fetched()
+    st.session_state.fetch_triggered   = True
+    st.session_state.fetched_rid       = resource_id
+    st.session_state.fetched_name      = name
+    st.session_state.fetched_df        = df
+    st.session_state.fetched_artifacts = {}
+    st.session_state.fetched_partial   = partial
+
+def cancel_fetch():
+    st.session_state.fetch_cancelled = True
+
+def render_live_preview(slot, partial):
+    """The rows fetched so far (a PartialFrame, or the DiskFrame being filled), redrawn in `slot`."""
+    head = drop_id(partial.head(PREVIEW_ROWS))
+    with slot.container():
+        c1, c2 = st.columns(2)
+        c1.metric(t("rows_fetched"), f"{partial.num_rows:,}")
+        if isinstance(partial, DiskFrame):
+            c2.metric(t("on_disk"), f"{partial.nbytes / 1024 ** 2:.1f} MB")
+        else:
+            c2.metric(t("est_memory"), f"{partial.nbytes / 1024:.1f} KB")
+        st.dataframe(head, use_container_width=True, height=420)
+        st.caption(t("live_preview_caption").format(shown=f"{len(head):,}"))
+
+def fetch_progressively(resource_id, name, max_rows, query):
+    """
+    Fetch a DataStore resource into the session, showing its first page as
+    soon as it lands and growing the preview with each round of pages.
+    Cancel reruns the script, which interrupts the fetch; the rows that
+    arrived are then kept by settle_partial_fetch.
+    """
+    st.session_state.fetch_cancelled = False
+    slot   = st.empty()
+    cancel = st.empty()
+    cancel.button(t("cancel_fetch_btn"), on_click=cancel_fetch, use_container_width=True)
+
+    def preview(partial):
+        st.session_state.partial_fetch = (resource_id, name, partial)
+        render_live_preview(slot, partial)
+
+    df = run_fetch(lambda progress: fetch_resource(
+        resource_id, max_rows=max_rows, query=query, progress=progress, preview=preview))
+    st.session_state.partial_fetch = None
+    slot.empty()
+    cancel.empty()
+    if df is not None:
+        store_fetched(resource_id, name, df)
+
+def settle_partial_fetch():
+    """
+    Deal with the rows of a fetch interrupted by a rerun: after Cancel their
+    contiguous head becomes the fetched frame; any other rerun drops them.
+    """
+    resource_id, name, partial = st.session_state.partial_fetch
+    cancelled = st.session_state.fetch_cancelled
+    st.session_state.partial_fetch   = None
+    st.session_state.fetch_cancelled = False
+    if not cancelled:
+        if isinstance(partial, DiskFrame): partial.discard()
+        return
+    if isinstance(partial, DiskFrame):
+        partial.keep_head()
+        df = partial
+    else:
+        df = opendata.partial_resource(partial)
+    if df.empty:
+        if isinstance(partial, DiskFrame): partial.discard()
+        st.toast(t("fetch_cancelled_done") if getattr(partial, "complete", False) else t("fetch_cancelled_empty"))
+        return
+    store_fetched(resource_id, name, df, partial=True)
+
+def fetched_artifact(name, build):
+    """Build an object derived from the fetched frame once and keep it alongside it."""
+    artifacts = st.session_state.fetched_artifacts
+    if name not in artifacts:
+        artifacts[name] = build()
+    return artifacts[name]
+
+def render_query_builder(resource_id, key):
+    """
+    Optional server-side query: columns, full-text search, one equality
+    filter and a sort order, or a raw datastore_search_sql statement.
+    Returns the query dict for load_resource, or None to fetch everything.
+    """
+    with st.expander(t("query_expander")):
+        mode = st.radio(t("query_mode"), ["filters", "sql"], horizontal=True, key=f"{key}_mode",
+                        format_func=lambda m: t("query_mode_filters") if m == "filters" else t("query_mode_sql"))
+        if mode == "sql":
+            sql = st.text_area(t("query_sql"), value=f'SELECT * FROM "{resource_id}"',
+                               help=t("query_sql_help"), key=f"{key}_sql")
+            return {"sql": sql} if sql.strip() else None
+        fields     = get_resource_fields(resource_id)
+        columns    = st.multiselect(t("query_columns"), fields, key=f"{key}_columns")
+        text       = st.text_input(t("query_text"), key=f"{key}_q")
+        filter_col = st.selectbox(t("query_filter_col"), fields, index=None, key=f"{key}_filter_col")
+        filter_val = st.text_input(t("query_filter_val"), key=f"{key}_filter_val",
+                                   disabled=filter_col is None)
+        sort_col   = st.selectbox(t("query_sort"), fields, index=None, key=f"{key}_sort")
+        sort_desc  = st.checkbox(t("query_desc"), key=f"{key}_desc", disabled=sort_col is None)
+    query = {}
+    if columns: query["fields"] = columns
+    if text.strip(): query["q"] = text.strip()
+    if filter_col and filter_val.strip():
+        values = [v.strip() for v in filter_val.split(",") if v.strip()]
+        query["filters"] = {filter_col: values if len(values) > 1 else values[0]}
+    if sort_col:
+        query["sort"] = f'"{sort_col}" {"desc" if sort_desc else "asc"}, _id'
+    return query or None
+
+def render_column_info(profile):
+    """The column information expander, from a profile_frame/profile_store result."""
+    def cell(value):
+        return "N/A" if value is None else str(value)
+
+    with st.expander(t("col_info_expander")):
+        col_info = pd.DataFrame([{
+            t("col_name"):     c["column"],
+            t("col_nonnull"):  c["non_null"],
+            t("col_null"):     c["nulls"],
+            t("col_dtype"):    c["dtype"],
+            t("col_distinct"): c["distinct"],
+            t("col_min"):      cell(c["min"]),
+            t("col_max"):      cell(c["max"]),
+            t("col_top"):      ", ".join(f"{v} ({n:,})" for v, n in c["top"]),
+            t("col_sample"):   cell(c["sample"]),
+        } for c in profile["columns"]])
+        st.dataframe(col_info, use_container_width=True, hide_index=True)
+
+def render_store_panel(store, resource_id, dataset_name):
+    """The data panel for an out-of-core DiskFrame: each view is a query over its parts on disk."""
+    st.caption(f"{t('resource_id_caption')}: `{resource_id}`")
+    total = store.num_rows
+    c1, c2, c3 = st.columns(3)
+    c1.metric(t("rows_fetched"), f"{total:,}")
+    c2.metric(t("columns"),      f"{len(store.columns):,}")
+    c3.metric(t("on_disk"),      f"{store.nbytes / 1024 ** 2:.1f} MB")
+    st.subheader(t("preview_header"))
+    f1, f2 = st.columns([3, 1])
+    search_term   = f1.text_input(t("filter_label"), value="", key=f"filter_{resource_id}")
+    search_column = f2.selectbox(t("filter_column"), [None, *store.columns], key=f"filter_col_{resource_id}",
+                                 format_func=lambda c: t("filter_all_columns") if c is None else str(c))
+    if search_term:
+        # One-entry memo: other widgets rerun the script without changing the filter.
+        last = fetched_artifact("store_filter", dict)
+        if last.get("key") != (search_term, search_column):
+            last["key"]    = (search_term, search_column)
+            last["result"] = store.filter(search_term, search_column, limit=PREVIEW_ROWS)
+        display_df, matches = last["result"]
+        st.caption(t("filter_caption_store").format(
+            matches=f"{matches:,}", total=f"{total:,}", shown=f"{len(display_df):,}"))
+    else:
+        pages = max(1, -(-total // PREVIEW_ROWS))
+        page  = st.number_input(t("preview_page"), min_value=1, max_value=pages, value=1,
+                                key=f"store_page_{resource_id}")
+        start = (page - 1) * PREVIEW_ROWS
+        display_df = store.window(start, start + PREVIEW_ROWS)
+        st.caption(t("window_caption").format(
+            start=f"{start + 1:,}", stop=f"{start + len(display_df):,}", total=f"{total:,}"))
+    st.dataframe(display_df, use_container_width=True, height=420)
+    render_column_info(fetched_artifact("profile", lambda: profile_store(store)))
+    st.subheader(t("download_header"))
+    e1, e2   = st.columns(2)
+    fmt      = e1.selectbox(t("export_format"), STORE_FORMATS, key=f"export_fmt_{resource_id}",
+                            format_func=lambda f: EXPORT_FORMATS[f][0])
+    compression = (e2.selectbox(t("export_compression"), PARQUET_COMPRESSIONS, key=f"export_comp_{resource_id}")
+                   if fmt == "parquet" else None)
+    label, suffix, mime = EXPORT_FORMATS[fmt]
+    export   = fetched_artifact(f"export_{fmt}_{compression}",
+                                lambda: FrameExport(store, suffix, store_writer(fmt, compression)))
+    filename = f"{dataset_name.replace(' ', '_')}_{resource_id[:8]}.{suffix}"
+    st.download_button(
+        label=t("download_btn").format(fmt=label), data=export.read, file_name=filename,
+        mime=mime, use_container_width=True, type="primary",
+    )
+    st.caption(t("download_caption").format(filename=filename))
+
 def render_data_panel(df, resource_id, dataset_name):
+    if st.session_state.fetched_partial:
+        st.info(t("partial_info"))
+    if isinstance(df, DiskFrame):
+        return render_store_panel(df, resource_id, dataset_name)
     st.caption(f"{t('resource_id_caption')}: `{resource_id}`")
+    # Profiled once per fetch; reruns (filter keystrokes included) reuse it.
+    profile = fetched_artifact("profile", lambda: profile_frame(df))
     c1, c2, c3 = st.columns(3)
-    c1.metric(t("rows_fetched"), f"{len(df):,}")
-    c2.metric(t("columns"),      f"{len(df.columns):,}")
-    c3.metric(t("est_memory"),   f"{df.memory_usage(deep=True).sum() / 1024:.1f} KB")
+    c1.metric(t("rows_fetched"), f"{profile['rows']:,}")
+    c2.metric(t("columns"),      f"{len(profile['columns']):,}")
+    before = df.attrs.get("memory_before")
+    c3.metric(t("est_memory"),   f"{profile['memory'] / 1024:.1f} KB",
+              delta=t("memory_compacted").format(pct=1 - profile["memory"] / before, before=f"{before / 1024:,.1f}")
+              if before else None, delta_color="inverse")
     st.subheader(t("preview_header"))
-    search_term = st.text_input(t("filter_label"), value="", key=f"filter_{resource_id}")
+    f1, f2 = st.columns([3, 1])
+    search_term   = f1.text_input(t("filter_label"), value="", key=f"filter_{resource_id}")
+    search_column = f2.selectbox(t("filter_column"), [None, *df.columns], key=f"filter_col_{resource_id}",
+                                 format_func=lambda c: t("filter_all_columns") if c is None else str(c))
     if search_term:
-        mask = df.apply(lambda col: col.astype(str).str.contains(search_term, case=False, na=False)).any(axis=1)
-        display_df = df[mask]
+        index      = fetched_artifact("search_index", lambda: SearchIndex(df))
+        display_df = df[index.mask(search_term, search_column)]
         st.caption(t("filter_caption").format(shown=f"{len(display_df):,}", total=f"{len(df):,}"))
     else:
         display_df = df
     st.dataframe(display_df, use_container_width=True, height=420)
-    with st.expander(t("col_info_expander")):
-        col_info = pd.DataFrame({
-            t("col_name"):    df.columns,
-            t("col_nonnull"): df.notna().sum().values,
-            t("col_null"):    df.isna().sum().values,
-            t("col_dtype"):   df.dtypes.astype(str).values,
-            t("col_sample"):  [str(df[c].dropna().iloc[0]) if df[c].notna().any() else "N/A" for c in df.columns],
-        })
-        st.dataframe(col_info, use_container_width=True, hide_index=True)
+    render_column_info(profile)
     st.subheader(t("download_header"))
-    csv_buffer = io.StringIO()
-    df.to_csv(csv_buffer, index=False, encoding="utf-8-sig")
-    csv_bytes = csv_buffer.getvalue().encode("utf-8-sig")
-    filename  = f"{dataset_name.replace(' ', '_')}_{resource_id[:8]}.csv"
+    geometry = fetched_artifact("geometry", lambda: find_geometry(df))
+    formats  = [f for f in EXPORT_FORMATS if f != "geoparquet" or (geometry and gpd is not None)]
+    e1, e2   = st.columns(2)
+    fmt      = e1.selectbox(t("export_format"), formats, key=f"export_fmt_{resource_id}",
+                            format_func=lambda f: EXPORT_FORMATS[f][0])
+    compression = (e2.selectbox(t("export_compression"), PARQUET_COMPRESSIONS, key=f"export_comp_{resource_id}")
+                   if fmt in ("parquet", "geoparquet") else None)
+    if geometry and gpd is None:
+        st.caption(t("geoparquet_unavailable"))
+    label, suffix, mime = EXPORT_FORMATS[fmt]
+    export   = fetched_artifact(f"export_{fmt}_{compression}",
+                                lambda: FrameExport(df, suffix, export_writer(fmt, compression, geometry)))
+    filename = f"{dataset_name.replace(' ', '_')}_{resource_id[:8]}.{suffix}"
+    # A callable is only run when the button is clicked, not on every rerun.
     st.download_button(
-        label=t("download_btn"), data=csv_bytes, file_name=filename,
-        mime="text/csv", use_container_width=True, type="primary",
+        label=t("download_btn").format(fmt=label), data=export.read, file_name=filename,
+        mime=mime, use_container_width=True, type="primary",
     )
     st.caption(t("download_caption").format(filename=filename))
 
+start_metrics()
+if st.session_state.partial_fetch is not None:
+    settle_partial_fetch()
+
 with st.sidebar:
     if st.button(t("language_toggle"), use_container_width=True):
         st.session_state.lang = "fr" if st.session_state.lang == "en" else "en"
@@ -407,14 +696,26 @@ with st.sidebar:
         )
         limit_rows = st.checkbox(t("limit_rows_label"), value=True)
         max_rows   = st.slider(t("max_rows_label"), 100, 10_000, 2_000, step=100) if limit_rows else None
+        query      = render_query_builder(resource_id_input.strip(), key="fetcher_query") if resource_id_input.strip() else None
         fetch_btn  = st.button(t("fetch_btn"), use_container_width=True, type="primary")
     else:
         resource_id_input = None
         max_rows          = None
+        query             = None
         fetch_btn         = False
+    out_of_core = st.checkbox(t("out_of_core"), help=t("out_of_core_help"), key="out_of_core")
     st.divider()
+    cache_stats = opendata.shared_resource_cache().stats()
+    st.caption(t("cache_stats").format(
+        hits=cache_stats["hits"], misses=cache_stats["misses"],
+        entries=cache_stats["entries"], size=cache_stats["bytes"] / 1024 ** 2))
+    if config.ADMIN_PANEL:
+        render_admin_panel()
     st.caption(t("sidebar_caption"))
 
+# Out-of-core fetches stream to disk, so the row limit is a choice rather than a memory guard.
+fetch_resource = opendata.fetch_to_store if out_of_core else opendata.load_resource
+
 st.title(t("page_title"))
 st.markdown(t("page_subtitle"))
 st.divider()
@@ -424,33 +725,23 @@ if page == "browser":
     st.markdown(t("browser_subtitle"))
     search_query = st.text_input(t("search_datasets"), placeholder=t("search_placeholder"), key="catalog_search")
     with st.spinner(t("loading_catalog")):
-        catalog = load_catalog()
-    if not catalog:
+        catalog_index = load_catalog_index()
+    if not catalog_index.packages:
+        load_catalog_index.clear()
         st.error(t("catalog_error"))
         st.stop()
-    if search_query:
-        q = search_query.lower()
-        catalog = [p for p in catalog
-                   if q in (p.get("title") or "").lower()
-                   or q in (p.get("notes") or "").lower()
-                   or any(q in (r.get("name") or "").lower() for r in p.get("resources", []))]
-    st.caption(t("results_count").format(count=len(catalog)))
-    if not catalog:
+    hits = catalog_index.search(search_query) if search_query else range(len(catalog_index.packages))
+    st.caption(t("results_count").format(count=len(hits)))
+    if not hits:
         st.info(t("no_results"))
         st.stop()
 
-    rows = []
-    for pkg in catalog:
-        org      = pkg.get("organization") or {}
-        last_mod = (pkg.get("metadata_modified") or "")[:10]
-        rows.append({
-            t("col_title"):     pkg.get("title", pkg.get("name", "N/A")),
-            t("col_org"):       org.get("title", "N/A") if isinstance(org, dict) else "N/A",
-            t("col_resources"): len(pkg.get("resources", [])),
-            t("col_updated"):   last_mod,
-        })
-    dataset_titles = [pkg.get("title", pkg.get("name", "N/A")) for pkg in catalog]
-    st.dataframe(pd.DataFrame(rows), use_container_width=True, height=320, hide_index=True)
+    rows = [catalog_index.summaries[i] for i in hits]
+    dataset_titles = [row[0] for row in rows]
+    st.dataframe(
+        pd.DataFrame(rows, columns=[t("col_title"), t("col_org"), t("col_resources"), t("col_updated")]),
+        use_container_width=True, height=320, hide_index=True,
+    )
 
     selected_title = st.selectbox(
         label=t("select_dataset"), options=dataset_titles,
@@ -462,12 +753,12 @@ if page == "browser":
 
     if selected_title != st.session_state.last_pkg_title:
         st.session_state.last_pkg_title  = selected_title
+        drop_fetched()
         st.session_state.fetch_triggered = False
-        st.session_state.fetched_df      = None
         st.session_state.last_res_label  = None
         st.session_state.res_total_count = None
 
-    selected_pkg = next((p for p in catalog if p.get("title", p.get("name")) == selected_title), None)
+    selected_pkg = catalog_index.by_title.get(selected_title)
 
     if selected_pkg:
         st.subheader(t("dataset_detail_title"))
@@ -502,8 +793,8 @@ if page == "browser":
             if selected_res_label != st.session_state.last_res_label:
                 st.session_state.last_res_label  = selected_res_label
                 st.session_state.fetch_triggered = False
-                st.session_state.fetched_df      = None
                 st.session_state.res_total_count = None
+                drop_fetched()
 
             selected_res = resources[res_labels.index(selected_res_label)]
             rid      = selected_res.get("id", "")
@@ -511,8 +802,18 @@ if page == "browser":
             res_fmt  = (selected_res.get("format") or "").upper()
             res_url  = selected_res.get("url", "")
 
-            if res_fmt and not is_tabular(res_fmt):
-                st.info(t("non_csv_info").format(fmt=res_fmt))
+            if res_fmt and not in_datastore(res_fmt, selected_res.get("datastore_active")):
+                if res_fmt in PREVIEW_FORMATS:
+                    st.info(t("file_preview_info").format(fmt=res_fmt))
+                    preview_rows = st.select_slider(t("file_preview_rows"), options=[100, 500, 1_000, 5_000, 10_000],
+                                                    value=config.FILE_PREVIEW_ROWS, key=f"file_preview_rows_{rid}")
+                    if st.button(t("file_preview_btn"), type="primary", use_container_width=True):
+                        preview_resource(rid, res_name, res_url, res_fmt, preview_rows)
+                    if st.session_state.fetch_triggered and st.session_state.fetched_df is not None:
+                        st.subheader(t("preview_header"))
+                        render_data_panel(st.session_state.fetched_df, st.session_state.fetched_rid, st.session_state.fetched_name)
+                else:
+                    st.info(t("non_csv_info").format(fmt=res_fmt))
                 st.subheader(t("download_header"))
                 filename = f"{res_name.replace(' ', '_')}_{rid[:8]}.{res_fmt.lower()}"
                 download_raw_file(res_url, filename, res_fmt)
@@ -523,22 +824,20 @@ if page == "browser":
                 total_count = st.session_state.res_total_count
                 if total_count and total_count > 0:
                     st.info(t("total_records_info").format(total=total_count))
-                    limit_rows_browser = st.checkbox(t("limit_rows_browser"), value=True, key="limit_rows_browser_cb")
+                    limit_rows_browser = st.checkbox(t("limit_rows_browser"), value=not out_of_core,
+                                                     key="limit_rows_browser_cb")
                     if limit_rows_browser:
                         browser_max_rows = safe_slider(total_count)
                     else:
                         browser_max_rows = None
-                        st.warning(t("fetch_all_warning").format(total=total_count))
+                        if not out_of_core:
+                            st.warning(t("fetch_all_warning").format(total=total_count))
                 else:
                     browser_max_rows = None
+                browser_query = render_query_builder(rid, key=f"browser_query_{rid}")
                 if st.button(t("fetch_resource_btn"), type="primary", use_container_width=True):
                     with st.spinner(t("connecting_spinner")):
-                        df = fetch_all_records(rid, max_rows=browser_max_rows)
-                    if df is not None:
-                        st.session_state.fetch_triggered = True
-                        st.session_state.fetched_rid     = rid
-                        st.session_state.fetched_name    = res_name
-                        st.session_state.fetched_df      = df
+                        fetch_progressively(rid, res_name, browser_max_rows, browser_query)
                 if st.session_state.fetch_triggered and st.session_state.fetched_df is not None:
                     st.subheader(t("preview_header"))
                     render_data_panel(st.session_state.fetched_df, st.session_state.fetched_rid, st.session_state.fetched_name)
@@ -546,26 +845,33 @@ if page == "browser":
 elif page == "fetcher":
     st.subheader(t("fetcher_title"))
     st.markdown(t("fetcher_subtitle"))
-    if fetch_btn:
-        if not resource_id_input.strip():
-            st.warning(t("warn_no_resource"))
-        else:
-            rid = resource_id_input.strip()
-            with st.spinner(t("checking_resource")):
-                res_fmt, res_url, res_name = get_resource_meta(rid)
-            res_fmt_upper = res_fmt.upper() if res_fmt else ""
-            st.subheader(f"{t('dataset_header')}: `{res_name}`")
-            if res_fmt_upper and not is_tabular(res_fmt_upper):
-                st.info(t("non_csv_fetcher_info").format(fmt=res_fmt_upper))
-                st.subheader(t("download_header"))
-                filename = f"{res_name.replace(' ', '_')}_{rid[:8]}.{res_fmt_upper.lower()}"
-                download_raw_file(res_url, filename, res_fmt_upper)
+    rid = resource_id_input.strip()
+    if fetch_btn and not rid:
+        st.warning(t("warn_no_resource"))
+    elif fetch_btn:
+        drop_fetched()
+        with st.spinner(t("checking_resource")):
+            res_fmt, res_url, res_name, _, datastore_active = get_resource_meta(rid)
+        res_fmt_upper = res_fmt.upper() if res_fmt else ""
+        st.subheader(f"{t('dataset_header')}: `{res_name}`")
+        if res_fmt_upper and not in_datastore(res_fmt_upper, datastore_active):
+            if res_fmt_upper in PREVIEW_FORMATS:
+                st.info(t("file_preview_info").format(fmt=res_fmt_upper))
+                preview_resource(rid, res_name, res_url, res_fmt_upper, max_rows or config.FILE_PREVIEW_ROWS)
             else:
-                with st.spinner(t("connecting_spinner")):
-                    df = fetch_all_records(rid, max_rows=max_rows)
-                if df is not None:
-                    render_data_panel(df, rid, res_name)
-    else:
+                st.info(t("non_csv_fetcher_info").format(fmt=res_fmt_upper))
+            st.subheader(t("download_header"))
+            filename = f"{res_name.replace(' ', '_')}_{rid[:8]}.{res_fmt_upper.lower()}"
+            download_raw_file(res_url, filename, res_fmt_upper)
+        else:
+            with st.spinner(t("connecting_spinner")):
+                fetch_progressively(rid, res_name, max_rows, query)
+    # Keep the fetched frame on screen across reruns (e.g. while typing in the row filter).
+    if st.session_state.fetched_df is not None and st.session_state.fetched_rid == rid:
+        if not fetch_btn:
+            st.subheader(f"{t('dataset_header')}: `{st.session_state.fetched_name}`")
+        render_data_panel(st.session_state.fetched_df, rid, st.session_state.fetched_name)
+    elif not fetch_btn:
         st.info(t("idle_info"))
         st.subheader(t("how_to_header"))
         st.markdown(t("how_to_body"))
@@ -0,0 +1 @@
+"""Offline benchmarks: a mock CKAN portal (mock_ckan) and the suite that runs against it (run)."""
@@ -0,0 +1,235 @@
+"""
+A stand-in CKAN portal for benchmarks and offline work. It serves
+datastore_search, package_search, package_show and resource_show over a
+synthetic table generated page by page, so it holds no data in memory.
+Table size and width, latency, bandwidth, the datastore's row cap and
+429 injection are configurable.
+
+    python -m bench.mock_ckan --rows 1000000 --columns 20 --latency 0.05 --p429 0.02
+
+The first line printed is the API base to give MTL_API_BASE or --api-base.
+"""
+import argparse
+import gzip
+import json
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+RESOURCE_ID = "00000000-bench-4000-8000-000000000000"
+BOROUGHS    = ["Ahuntsic-Cartierville", "Anjou", "Côte-des-Neiges–Notre-Dame-de-Grâce", "Lachine", "LaSalle",
+               "Le Plateau-Mont-Royal", "Le Sud-Ouest", "Mercier–Hochelaga-Maisonneuve", "Montréal-Nord",
+               "Outremont", "Rosemont–La Petite-Patrie", "Saint-Laurent", "Verdun", "Ville-Marie"]
+KINDS       = ("category", "int", "float", "date", "text")
+CKAN_TYPES  = {"category": "text", "int": "int4", "float": "numeric", "date": "timestamp", "text": "text"}
+EPOCH       = datetime(2020, 1, 1, tzinfo=timezone.utc)
+
+
+class Table:
+    """Rows computed from their _id, so any page can be generated on demand and is the same every time."""
+    def __init__(self, rows, columns, typed=False):
+        self.rows  = rows
+        self.kinds = [KINDS[i % len(KINDS)] for i in range(columns)]
+        self.names = [f"{kind}_{i}" for i, kind in enumerate(self.kinds)]
+        self.typed = typed
+
+    def fields(self):
+        return [{"id": "_id", "type": "int"}] + [
+            {"id": name, "type": CKAN_TYPES[kind] if self.typed else "text"}
+            for name, kind in zip(self.names, self.kinds)]
+
+    def cell(self, kind, i, col):
+        if kind == "category": return BOROUGHS[(i * 7 + col) % len(BOROUGHS)]
+        if kind == "int":
+            value = (i * 2654435761 + col) % 100_000
+            return value if self.typed else str(value)
+        if kind == "float":
+            value = ((i * 40503 + col) % 10_000_000) / 100
+            return value if self.typed else f"{value:.2f}"
+        if kind == "date": return (EPOCH + timedelta(minutes=i * 37 + col)).strftime("%Y-%m-%dT%H:%M:%S")
+        return f"Intervention {i} sur la rue {col}, secteur {BOROUGHS[i % len(BOROUGHS)]}"
+
+    def records(self, offset, limit):
+        columns = list(enumerate(zip(self.names, self.kinds)))
+        return [{"_id": i + 1, **{name: self.cell(kind, i, col) for col, (name, kind) in columns}}
+                for i in range(offset, min(offset + limit, self.rows))]
+
+
+class MockCKAN:
+    """
+    The server and its settings. `latency` is added to every response,
+    `bandwidth` (bytes/s, 0 = unlimited) paces bodies, and a `p429` share of
+    requests is answered 429 with `retry_after` seconds. Pages are capped
+    at `rows_max` rows, like CKAN's ckan.datastore.search.rows_max.
+    """
+    def __init__(self, rows=100_000, columns=12, packages=2_000, latency=0.0, bandwidth=0, p429=0.0,
+                 retry_after=1, rows_max=32_000, typed=False, compress=False, seed=0):
+        self.table       = Table(rows, columns, typed)
+        self.packages    = self._packages(packages)
+        self.by_name     = {p["name"]: p for p in self.packages} | {p["id"]: p for p in self.packages}
+        self.latency     = latency
+        self.bandwidth   = bandwidth
+        self.p429        = p429
+        self.retry_after = retry_after
+        self.rows_max    = rows_max
+        self.compress    = compress
+        self.requests    = {}
+        self._random     = random.Random(seed)
+        self._lock       = threading.Lock()
+        self.server      = None
+
+    def _packages(self, n):
+        packages = []
+        for i in range(n):
+            modified  = (EPOCH + timedelta(hours=i)).strftime("%Y-%m-%dT%H:%M:%S.%f")
+            resources = [{"id": f"{i:08d}-file-4000-8000-000000000000", "name": f"rapport-{i}.pdf",
+                          "format": "PDF", "datastore_active": False, "url": f"https://example.org/{i}.pdf"}]
+            if i == 0:
+                resources.insert(0, self.resource())
+            packages.append({
+                "id": f"{i:08d}-pkg0-4000-8000-000000000000", "name": f"jeu-de-donnees-{i}",
+                "title": f"{BOROUGHS[i % len(BOROUGHS)]} — jeu de données {i}",
+                "notes": "Données synthétiques pour les essais de performance.",
+                "organization": {"title": "Ville de Montréal"},
+                "metadata_created": modified, "metadata_modified": modified, "resources": resources,
+            })
+        return packages
+
+    def resource(self):
+        return {"id": RESOURCE_ID, "name": "synthetic table", "format": "CSV", "datastore_active": True,
+                "url": f"https://example.org/{RESOURCE_ID}.csv", "last_modified": f"rows-{self.table.rows}"}
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/api/3/action/"
+
+    def throttle(self):
+        with self._lock:
+            return self._random.random() < self.p429
+
+    def count(self, action):
+        with self._lock:
+            self.requests[action] = self.requests.get(action, 0) + 1
+
+    def datastore_search(self, q):
+        if q.get("resource_id") != RESOURCE_ID:
+            return 404, {"success": False, "error": {"__type": "Not Found Error"}}
+        limit  = min(int(q.get("limit", 100)), self.rows_max)
+        offset = int(q.get("offset", 0))
+        return 200, {"success": True, "result": {
+            "resource_id": RESOURCE_ID, "fields": self.table.fields(), "total": self.table.rows,
+            "limit": limit, "offset": offset, "records": self.table.records(offset, limit)}}
+
+    def package_search(self, q):
+        packages = self.packages
+        fq = q.get("fq", "")
+        if fq.startswith("metadata_modified:["):
+            since    = fq.split("[", 1)[1].split(" ", 1)[0].rstrip("Z")
+            packages = [p for p in packages if p["metadata_modified"] >= since]
+        if q.get("q"):
+            term     = q["q"].lower()
+            packages = [p for p in packages if term in p["title"].lower()]
+        if q.get("sort", "").startswith("metadata_modified desc"):
+            packages = packages[::-1]
+        start, rows = int(q.get("start", 0)), min(int(q.get("rows", 10)), 1_000)
+        return 200, {"success": True, "result": {"count": len(packages), "results": packages[start:start + rows]}}
+
+    def package_show(self, q):
+        pkg = self.by_name.get(q.get("id", ""))
+        return (200, {"success": True, "result": pkg}) if pkg else (404, {"success": False})
+
+    def resource_show(self, q):
+        if q.get("id") == RESOURCE_ID:
+            return 200, {"success": True, "result": self.resource()}
+        return 404, {"success": False, "error": {"__type": "Not Found Error"}}
+
+    def start(self, host="127.0.0.1", port=0):
+        """Serve from a daemon thread; port 0 picks a free one (see `url`)."""
+        self.server = ThreadingHTTPServer((host, port), make_handler(self))
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True, name="mock-ckan").start()
+        return self
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+def make_handler(mock):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"      # keep-alive, like the real portal
+
+        def do_GET(self):
+            url    = urlparse(self.path)
+            action = url.path.rstrip("/").rsplit("/", 1)[-1]
+            query  = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            mock.count(action)
+            if mock.latency: time.sleep(mock.latency)
+            if action in ("datastore_search", "package_search") and mock.p429 and mock.throttle():
+                return self.reply(429, {"success": False, "error": {"message": "Too many requests"}},
+                                  {"Retry-After": str(mock.retry_after)})
+            handler = getattr(mock, action, None) if action in (
+                "datastore_search", "package_search", "package_show", "resource_show") else None
+            if handler is None:
+                return self.reply(400, {"success": False, "error": {"message": f"unknown action {action}"}})
+            self.reply(*handler(query))
+
+        def reply(self, status, body, headers=None):
+            data = json.dumps(body).encode()
+            gzipped = mock.compress and "gzip" in self.headers.get("Accept-Encoding", "")
+            if gzipped: data = gzip.compress(data, compresslevel=5)
+            if mock.bandwidth: time.sleep(len(data) / mock.bandwidth)
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json;charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            if gzipped: self.send_header("Content-Encoding", "gzip")
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench.mock_ckan", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765, help="0 picks a free port")
+    parser.add_argument("--rows", type=int, default=100_000, help="rows in the datastore table")
+    parser.add_argument("--columns", type=int, default=12, help="columns besides _id")
+    parser.add_argument("--packages", type=int, default=2_000, help="datasets in the catalog")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--bandwidth", type=float, default=0, help="MB/s per response, 0 = unlimited")
+    parser.add_argument("--p429", type=float, default=0.0, help="share of search requests answered 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with a 429")
+    parser.add_argument("--rows-max", type=int, default=32_000, help="datastore page cap")
+    parser.add_argument("--typed", action="store_true", help="declare int/numeric/timestamp fields (default: all text)")
+    parser.add_argument("--gzip", action="store_true", help="gzip responses when the client accepts it")
+    parser.add_argument("--seed", type=int, default=0, help="seed for 429 injection")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    mock = MockCKAN(rows=args.rows, columns=args.columns, packages=args.packages, latency=args.latency,
+                    bandwidth=args.bandwidth * 1024 ** 2, p429=args.p429, retry_after=args.retry_after,
+                    rows_max=args.rows_max, typed=args.typed, compress=args.gzip, seed=args.seed)
+    mock.start(args.host, args.port)
+    print(mock.url, flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
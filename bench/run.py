@@ -0,0 +1,244 @@
+"""
+Offline benchmarks of the fetch layer against bench/mock_ckan.py.
+
+    python -m bench.run [--rows 200000] [--columns 12] [--latency 0.02] [--p429 0.01] [--json out.json]
+
+The mock runs in a subprocess so its JSON encoding does not share the
+benchmarked interpreter. Each benchmark reports the best wall time of
+--repeat runs, throughput, time to first row where rows arrive
+progressively, and peak memory from one more run under tracemalloc (kept
+apart because tracing slows allocation-heavy code). tracemalloc sees
+Python and NumPy allocations but not Arrow's own memory pool.
+"""
+import argparse
+import json
+import logging
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+from opendata import config, metrics
+from opendata.api import fetch_all_records
+from opendata.catalog import load_catalog
+from opendata.compact import compact_frame
+from opendata.export import write_csv
+from opendata.search import SearchIndex
+from opendata.store import fetch_to_store
+
+from .mock_ckan import RESOURCE_ID
+
+
+class FirstResponse(logging.Handler):
+    """Notes when the first response for `endpoint` is logged by http_get."""
+    def __init__(self, endpoint):
+        super().__init__(logging.DEBUG)
+        self.prefix = f"GET {endpoint} 200"
+        self.at     = None
+
+    def emit(self, record):
+        if self.at is None and record.getMessage().startswith(self.prefix):
+            self.at = time.perf_counter()
+
+
+class FirstWrite:
+    """A binary file that notes the time of its first write."""
+    def __init__(self, path):
+        self._file = open(path, "wb")
+        self.at    = None
+
+    def write(self, data):
+        if self.at is None: self.at = time.perf_counter()
+        return self._file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    def __iter__(self):
+        return iter(self._file)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._file.close()
+
+
+def received_bytes():
+    return sum(metrics.http_bytes.values().values())
+
+def measure(name, run, repeat):
+    """
+    Best of `repeat` timed runs, then one traced run. `run()` returns
+    (rows, first_row_at or None, bytes or None); the clock starts just before it.
+    """
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows, first, nbytes = run()
+        seconds = time.perf_counter() - started
+        if best is None or seconds < best["seconds"]:
+            best = {"seconds": seconds, "rows": rows, "bytes": nbytes,
+                    "first_row": None if first is None else first - started}
+    tracemalloc.start()
+    try:
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    result = {"benchmark": name, **best, "rows_per_s": best["rows"] / best["seconds"],
+              "mb_per_s": best["bytes"] / best["seconds"] / 1024 ** 2 if best["bytes"] else None,
+              "peak_mb": peak / 1024 ** 2}
+    print(format_row(result), flush=True)
+    return result
+
+def format_row(r):
+    def num(value, width, digits):
+        return f"{'—':>{width}}" if value is None else f"{value:>{width}.{digits}f}"
+    return (f"{r['benchmark']:<26}{r['rows']:>10,}{r['seconds']:>9.3f}{r['rows_per_s']:>12,.0f}"
+            f"{num(r['mb_per_s'], 9, 1)}{num(r['first_row'], 10, 3)}{r['peak_mb']:>10.1f}")
+
+HEADER = f"{'benchmark':<26}{'rows':>10}{'seconds':>9}{'rows/s':>12}{'MB/s':>9}{'first row':>10}{'peak MB':>10}"
+
+
+def bench_fetch(workers):
+    def run():
+        first   = []
+        before  = received_bytes()
+        df      = fetch_all_records(RESOURCE_ID, workers=workers,
+                                    progress=lambda fetched, total: first or first.append(time.perf_counter()))
+        return len(df), first[0] if first else None, received_bytes() - before
+    return run
+
+def bench_fetch_to_store():
+    def run():
+        first  = []
+        before = received_bytes()
+        store  = fetch_to_store(RESOURCE_ID, progress=lambda fetched, total: first or first.append(time.perf_counter()))
+        try:
+            return store.num_rows, first[0] if first else None, received_bytes() - before
+        finally:
+            store.discard()
+    return run
+
+def bench_catalog(cache_root):
+    log = logging.getLogger("opendata.api")
+    def run():
+        # A fresh cache directory each time, so every run is a full catalog load.
+        config.CACHE_DIR = Path(tempfile.mkdtemp(dir=cache_root))
+        first  = FirstResponse("package_search")
+        before = received_bytes()
+        log.addHandler(first)
+        try:
+            packages = load_catalog()
+        finally:
+            log.removeHandler(first)
+        return len(packages), first.at, received_bytes() - before
+    return run
+
+def bench_csv(df, out_dir):
+    def run():
+        out = FirstWrite(out_dir / "export.csv")
+        with out:
+            write_csv(df, out)
+        return len(df), out.at, (out_dir / "export.csv").stat().st_size
+    return run
+
+def bench_store_csv(store, out_dir):
+    def run():
+        path = out_dir / "store.csv"
+        store.write(path, "csv")
+        return store.num_rows, None, path.stat().st_size
+    return run
+
+def bench_filter(df, term):
+    def run():
+        SearchIndex(df).mask(term)
+        return len(df), None, None
+    return run
+
+def bench_filter_query(index, term):
+    def run():
+        index.mask(term)
+        return len(index.text), None, None
+    return run
+
+def bench_store_filter(store, term):
+    def run():
+        store.filter(term)
+        return store.num_rows, None, None
+    return run
+
+
+def start_mock(args):
+    cmd = [sys.executable, "-m", "bench.mock_ckan", "--port", "0", "--rows", str(args.rows),
+           "--columns", str(args.columns), "--packages", str(args.packages), "--latency", str(args.latency),
+           "--bandwidth", str(args.bandwidth), "--p429", str(args.p429), "--retry-after", str(args.retry_after)]
+    if args.typed: cmd.append("--typed")
+    if args.gzip:  cmd.append("--gzip")
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True, cwd=Path(__file__).resolve().parent.parent)
+    base = proc.stdout.readline().strip()
+    if not base:
+        proc.kill()
+        raise SystemExit("mock CKAN server did not start")
+    return proc, base
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench.run", description="Offline fetch-layer benchmarks.")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--columns", type=int, default=12)
+    parser.add_argument("--packages", type=int, default=5_000)
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds added to every mock response")
+    parser.add_argument("--bandwidth", type=float, default=0, help="MB/s per mock response, 0 = unlimited")
+    parser.add_argument("--p429", type=float, default=0.0, help="share of mock search requests answered 429")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--typed", action="store_true", help="mock declares numeric and timestamp fields")
+    parser.add_argument("--gzip", action="store_true", help="mock gzips its responses")
+    parser.add_argument("--workers", type=int, default=config.FETCH_WORKERS)
+    parser.add_argument("--rate", type=float, default=50.0,
+                        help="client request budget per second (the app's default of "
+                             f"{config.REQUESTS_PER_SEC:g} would dominate every timing)")
+    parser.add_argument("--term", default="verdun", help="row filter search term")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", type=Path, help="also write the results here")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.getLogger("opendata.api").setLevel(logging.DEBUG)      # FirstResponse reads http_get's debug records
+    config.REQUESTS_PER_SEC = config.MIN_REQUESTS_PER_SEC = config.MAX_REQUESTS_PER_SEC = args.rate
+    proc, base = start_mock(args)
+    config.use_api_base(base)
+    with tempfile.TemporaryDirectory(prefix="mtl-bench-") as tmp:
+        tmp = Path(tmp)
+        config.CACHE_DIR = tmp / "cache"
+        try:
+            print(f"mock: {base}  rows={args.rows:,} columns={args.columns} latency={args.latency}s "
+                  f"p429={args.p429} workers={args.workers} rate={args.rate:g}/s", flush=True)
+            print(HEADER)
+            results = [measure("fetch_all_records", bench_fetch(args.workers), args.repeat)]
+            df      = compact_frame(fetch_all_records(RESOURCE_ID, workers=args.workers))
+            store   = fetch_to_store(RESOURCE_ID)
+            index   = SearchIndex(df)
+            results += [
+                measure("fetch_to_store", bench_fetch_to_store(), args.repeat),
+                measure("load_catalog", bench_catalog(tmp), args.repeat),
+                measure("csv export", bench_csv(df, tmp), args.repeat),
+                measure("csv export (out-of-core)", bench_store_csv(store, tmp), args.repeat),
+                measure("row filter (index + scan)", bench_filter(df, args.term), args.repeat),
+                measure("row filter (scan)", bench_filter_query(index, args.term), args.repeat),
+                measure("row filter (out-of-core)", bench_store_filter(store, args.term), args.repeat),
+            ]
+            store.discard()
+        finally:
+            proc.kill()
+    if args.json:
+        args.json.write_text(json.dumps({"args": {k: str(v) for k, v in vars(args).items()}, "results": results},
+                                        indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
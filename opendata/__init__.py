@@ -0,0 +1,28 @@
+"""
+Fetch layer for the Montréal open data portal, usable without Streamlit.
+The app in app.py and the `python -m opendata` batch CLI both build on it.
+"""
+from .api import (FetchCancelled, FetchError, PartialFrame, fetch_all_records, fetch_sql_records, get_package,
+                  get_resource, get_resource_fields, get_resource_meta, get_resource_total)
+from .cache import load_resource, partial_resource, shared_resource_cache
+from .compact import compact_frame
+from .flight import shared_flights
+from .catalog import load_catalog, search_packages
+from .files import shared_file_cache
+from .preview import PREVIEW_FORMATS, PreviewUnavailable, preview_file
+from .export import EXPORT_FORMATS, PARQUET_COMPRESSIONS, FrameExport, export_writer, find_geometry
+from .profile import profile_frame, profile_store
+from .search import CatalogIndex, SearchIndex
+from .store import STORE_FORMATS, DiskFrame, fetch_to_store
+
+__all__ = [
+    "FetchCancelled", "FetchError", "PartialFrame", "fetch_all_records", "fetch_sql_records", "get_package", "get_resource",
+    "get_resource_fields", "get_resource_meta", "get_resource_total",
+    "load_resource", "partial_resource", "shared_resource_cache", "compact_frame", "shared_flights",
+    "load_catalog", "search_packages",
+    "shared_file_cache", "PREVIEW_FORMATS", "PreviewUnavailable", "preview_file",
+    "EXPORT_FORMATS", "PARQUET_COMPRESSIONS", "FrameExport", "export_writer", "find_geometry",
+    "profile_frame", "profile_store",
+    "CatalogIndex", "SearchIndex",
+    "STORE_FORMATS", "DiskFrame", "fetch_to_store",
+]
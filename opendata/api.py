@@ -0,0 +1,624 @@
+"""
+CKAN datastore access: rate limiting, retries, paging and typed chunks.
+"""
+import json
+import logging
+import random
+import re
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import make_headers
+
+from . import config, metrics
+from .compact import compact_frame, exact_numbers
+
+log = logging.getLogger(__name__)
+
+INT_TYPES   = {"int", "int2", "int4", "int8", "integer", "bigint", "smallint"}
+FLOAT_TYPES = {"float", "float4", "float8", "numeric", "double precision", "real"}
+DATE_TYPES  = {"timestamp", "timestamptz", "date"}
+ORDER_BY    = re.compile(r"\border\s+by\b", re.IGNORECASE)
+ORDER_END   = re.compile(r"\b(?:limit|offset|fetch|for)\b", re.IGNORECASE)
+SQL_NESTED  = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/|\(|\)", re.DOTALL)
+
+
+class FetchError(Exception):
+    """A datastore request still failed after every retry."""
+
+
+class FetchCancelled(FetchError):
+    """A fetch stopped because its PartialFrame was cancelled."""
+
+
+class RateLimiter:
+    """
+    Token bucket shared by every fetch worker so concurrent paging stays
+    polite to the portal. The rate adapts AIMD-style: it creeps up by
+    rate_step after each successful request, up to max_rate, and halves
+    (down to min_rate) when the portal throttles, which also pauses every
+    worker until the throttle's Retry-After has passed.
+    """
+    def __init__(self, rate: float, burst: int = 1, min_rate=None, max_rate=None, rate_step=0.05):
+        self.rate      = rate
+        self.burst     = burst
+        self.min_rate  = min_rate or rate
+        self.max_rate  = max_rate or rate
+        self.rate_step = rate_step
+        self.throttles = 0
+        self._tokens   = float(burst)
+        self._last     = time.monotonic()
+        self._paused_until = 0.0
+        self._lock     = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                else:
+                    self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                    self._last   = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def succeeded(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + self.rate_step)
+
+    def throttled(self, delay):
+        """Back off after a 429/503. Responses to requests already in flight during a pause count once."""
+        with self._lock:
+            now = time.monotonic()
+            if now >= self._paused_until:
+                self.rate       = max(self.min_rate, self.rate / 2)
+                self.throttles += 1
+            self._paused_until = max(self._paused_until, now + delay)
+            self._tokens       = 0.0
+            self._last         = self._paused_until
+
+
+_limiter      = None
+_limiter_lock = threading.Lock()
+
+def shared_rate_limiter():
+    """One request budget per process, shared by every session, worker and batch job."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(config.REQUESTS_PER_SEC, min_rate=config.MIN_REQUESTS_PER_SEC,
+                                   max_rate=config.MAX_REQUESTS_PER_SEC)
+        return _limiter
+
+
+_session      = None
+_session_lock = threading.Lock()
+
+def shared_session():
+    """
+    One pooled, keep-alive session per process, so paging reuses a few warm
+    connections instead of a TCP+TLS handshake per request. Retries are
+    handled by api_get, not the adapter.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=config.POOL_SIZE, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            # urllib3 only offers br when it can decode it (brotli or brotlicffi installed).
+            session.headers.update(make_headers(accept_encoding=True))
+            _session = session
+        return _session
+
+def endpoint_of(url):
+    return url.rstrip("/").rsplit("/", 1)[-1]
+
+def http_get(url, endpoint=None, timeout=None, **kwargs):
+    """
+    GET through the shared session. The read timeout comes from
+    config.READ_TIMEOUTS, keyed by `endpoint` or the action name in the URL,
+    which also labels the request's metrics. Streamed bodies are counted
+    by whoever reads them.
+    """
+    endpoint = endpoint or endpoint_of(url)
+    if timeout is None:
+        timeout = (config.CONNECT_TIMEOUT, config.READ_TIMEOUTS.get(endpoint, 60))
+    started = time.perf_counter()
+    try:
+        resp = shared_session().get(url, timeout=timeout, **kwargs)
+    except requests.RequestException as e:
+        metrics.http_requests.inc(endpoint=endpoint, status="error")
+        log.debug("GET %s failed after %.3f s: %s", endpoint, time.perf_counter() - started, e)
+        raise
+    seconds = time.perf_counter() - started
+    metrics.http_requests.inc(endpoint=endpoint, status=str(resp.status_code))
+    metrics.http_seconds.observe(seconds, endpoint=endpoint)
+    if not kwargs.get("stream"):
+        nbytes = resp.raw.tell() or len(resp.content)
+        metrics.http_bytes.inc(nbytes, endpoint=endpoint)
+        log.debug("GET %s %d %.3f s %d B", endpoint, resp.status_code, seconds, nbytes)
+    return resp
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff, so workers that failed together retry apart."""
+    return random.uniform(0, min(config.BACKOFF_MAX, config.BACKOFF_BASE * 2 ** attempt))
+
+def retry_after(resp):
+    """Seconds from a Retry-After header (delta-seconds or HTTP date), capped at BACKOFF_MAX; None if absent."""
+    value = resp.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(delay, 0.0), config.BACKOFF_MAX)
+
+def api_get(url, params, limiter=None, timeout=None, meter=None):
+    """
+    GET a CKAN action with retries; returns the JSON body or None. A 429 or
+    503 waits out Retry-After (or a jittered backoff) and slows the shared
+    limiter. `meter(nbytes, seconds)` receives the size and latency of the
+    successful response.
+    """
+    endpoint = endpoint_of(url)
+    for attempt in range(config.MAX_RETRIES):
+        last = attempt == config.MAX_RETRIES - 1
+        if limiter: limiter.acquire()
+        try:
+            started = time.monotonic()
+            resp    = http_get(url, params=params, timeout=timeout)
+            if resp.status_code in (429, 503):
+                delay = retry_after(resp)
+                delay = backoff_delay(attempt) if delay is None else delay
+                if not last:
+                    metrics.http_retries.inc(endpoint=endpoint, reason=str(resp.status_code))
+                    log.info("%s throttled (%d), retrying in %.1f s", endpoint, resp.status_code, delay)
+                if limiter: limiter.throttled(delay)
+                else:       time.sleep(delay)
+                continue
+            resp.raise_for_status()
+            with metrics.parse_seconds.time(endpoint=endpoint):
+                body = resp.json()
+            if meter: meter(len(resp.content), time.monotonic() - started)
+            if limiter: limiter.succeeded()
+            return body
+        except requests.RequestException as e:
+            if not last:
+                metrics.http_retries.inc(endpoint=endpoint, reason="error")
+                log.warning("%s failed (attempt %d of %d): %s", endpoint, attempt + 1, config.MAX_RETRIES, e)
+                time.sleep(backoff_delay(attempt))
+    log.error("%s failed after %d attempts: %s", endpoint, config.MAX_RETRIES, params)
+    return None
+
+def api_result(url, params, limiter=None, timeout=None, meter=None):
+    """The `result` of a CKAN action; raises FetchError when the call fails."""
+    data = api_get(url, params, limiter, timeout, meter)
+    if data is None or not data.get("success"):
+        raise FetchError(f"{url} failed for {params}")
+    return data["result"]
+
+
+def get_resource_total(resource_id):
+    try:
+        resp = http_get(config.BASE_URL, params={"resource_id": resource_id, "limit": 1, "offset": 0})
+        resp.raise_for_status()
+        data = resp.json()
+        if data.get("success"): return data["result"]["total"]
+    except Exception: pass
+    return None
+
+def get_resource_fields(resource_id):
+    """Column names of a datastore resource, for the query builder."""
+    try:
+        resp = http_get(config.BASE_URL, params={"resource_id": resource_id, "limit": 0})
+        resp.raise_for_status()
+        data = resp.json()
+        if data.get("success"):
+            return [f["id"] for f in data["result"].get("fields", []) if f["id"] != "_id"]
+    except Exception: pass
+    return []
+
+def get_resource(resource_id):
+    """The resource_show record, or None."""
+    try:
+        resp = http_get(config.PACKAGE_URL, params={"id": resource_id})
+        resp.raise_for_status()
+        data = resp.json()
+        if data.get("success"): return data["result"]
+    except Exception: pass
+    return None
+
+def get_resource_meta(resource_id):
+    """
+    (format, url, name, version, in_datastore) where version is last_modified
+    or metadata_modified and in_datastore is datastore_active (None if unknown).
+    """
+    r = get_resource(resource_id)
+    if r is None:
+        return ("", "", resource_id, None, None)
+    return (r.get("format", ""), r.get("url", ""), r.get("name", resource_id),
+            r.get("last_modified") or r.get("metadata_modified"), r.get("datastore_active"))
+
+def get_package(name_or_id):
+    """The package_show record for a dataset name or id, or None."""
+    try:
+        resp = http_get(config.PACKAGE_SHOW, params={"id": name_or_id})
+        resp.raise_for_status()
+        data = resp.json()
+        if data.get("success"): return data["result"]
+    except Exception: pass
+    return None
+
+
+def fetch_page(resource_id, offset=0, limit=None, limiter=None, query=None, meter=None):
+    """
+    One datastore_search page. `query` may carry q, filters, fields and sort,
+    which the datastore applies before paging.
+    """
+    # Sorting on _id keeps pages stable when several offsets are requested concurrently.
+    params = {"resource_id": resource_id, "limit": limit or config.PAGE_SIZE,
+              "offset": offset, "sort": "_id"}
+    for key, value in (query or {}).items():
+        if not value: continue
+        if key == "filters":  value = json.dumps(value)
+        elif key == "fields": value = ",".join(value)
+        params[key] = value
+    return api_get(config.BASE_URL, params, limiter, meter=meter)
+
+def records_to_frame(records, fields):
+    """
+    Turn one page of datastore records into a DataFrame chunk, typed from
+    the `fields` schema so the raw dicts can be dropped as soon as a page lands.
+    Integers are parsed without a detour through float64, and numeric text too
+    long for float64 is kept as sent rather than rounded.
+    """
+    with metrics.frame_seconds.time():
+        df = pd.DataFrame.from_records(records, columns=[f["id"] for f in fields] or None)
+        for field in fields:
+            col, kind = field["id"], field.get("type", "text").lower()
+            if col not in df.columns: continue
+            if kind in INT_TYPES:
+                # from_records has already made a column with nulls float64; parse the raw values instead.
+                raw     = pd.Series([r.get(col) for r in records], index=df.index, dtype=object)
+                df[col] = pd.to_numeric(raw, errors="coerce", dtype_backend="numpy_nullable").astype("Int64")
+            elif kind in FLOAT_TYPES:
+                numbers = pd.to_numeric(df[col], errors="coerce").astype("float64")
+                strings = df[col][df[col].map(lambda v: isinstance(v, str))]
+                if strings.empty or exact_numbers(numbers, strings):
+                    df[col] = numbers
+            elif kind in DATE_TYPES:
+                df[col] = pd.to_datetime(df[col], errors="coerce", format="ISO8601")
+            elif kind == "bool":
+                df[col] = df[col].astype("boolean")
+    metrics.frame_rows.inc(len(df))
+    return df
+
+class PageSizer:
+    """
+    Picks the `limit` for the next page from the pages measured so far:
+    pages of about TARGET_PAGE_SECONDS and at most TARGET_PAGE_BYTES, so wide
+    rows get short pages and narrow ones long pages. Each step at most
+    doubles or quarters the limit, within [PAGE_SIZE_MIN, PAGE_SIZE_MAX].
+    """
+    def __init__(self, limit=None):
+        self.limit    = limit or config.PAGE_SIZE
+        self.max_size = config.PAGE_SIZE_MAX
+        self._lock    = threading.Lock()
+
+    def observe(self, rows, nbytes, seconds):
+        if rows <= 0 or seconds <= 0: return
+        with self._lock:
+            by_time    = config.TARGET_PAGE_SECONDS * rows / seconds
+            by_bytes   = config.TARGET_PAGE_BYTES * rows / max(nbytes, 1)
+            target     = min(by_time, by_bytes, self.limit * 2)
+            target     = max(target, self.limit / 4, config.PAGE_SIZE_MIN)
+            self.limit = int(min(target, self.max_size))
+
+    def cap(self, rows):
+        """The portal returned fewer rows than asked for: its own maximum is lower than ours."""
+        with self._lock:
+            self.max_size = min(self.max_size, rows)
+            self.limit    = min(self.limit, rows)
+
+
+def stream_records(resource_id, sink, max_rows=None, workers=None, start=0, query=None, progress=None):
+    """
+    Fetch the first page to learn the total and schema, then hand out the
+    remaining offsets to a bounded worker pool. Each page's limit comes from
+    a PageSizer fed by the pages already measured; the number of pages in
+    flight halves when the portal throttles and otherwise grows back by one
+    per round, up to `workers`. Each page becomes a typed chunk on arrival
+    and goes to `sink(offset, chunk)` in the calling thread, in completion
+    order. `start` skips rows already held locally (see sync_resource), and
+    `progress(fetched, total)` is called from the calling thread.
+    Returns the number of rows fetched; raises FetchError if a page cannot
+    be retrieved.
+    """
+    limiter = shared_rate_limiter()
+    sizer   = PageSizer()
+
+    def fetch_measured(off, limit):
+        measured = []
+        page = fetch_page(resource_id, offset=off, limit=limit, limiter=limiter, query=query,
+                          meter=lambda nbytes, seconds: measured.append((nbytes, seconds)))
+        if page is None or not page.get("success"):
+            raise FetchError(f"datastore_search failed for {resource_id} at offset {off}")
+        if measured: sizer.observe(len(page["result"]["records"]), *measured[0])
+        return page["result"]
+
+    def fetch_chunk(off, limit):
+        return records_to_frame(fetch_measured(off, limit)["records"], fields)
+
+    result  = fetch_measured(start, min(sizer.limit, max_rows) if max_rows else sizer.limit)
+    fields  = result.get("fields", [])
+    total   = max(result["total"] - start, 0)
+    end     = start + (min(total, max_rows) if max_rows else total)
+    chunk   = records_to_frame(result["records"], fields)
+    fetched = len(chunk)
+    del result
+    sink(start, chunk)
+    if progress: progress(fetched, total)
+
+    max_workers = max(1, workers or config.FETCH_WORKERS)
+    window      = float(max_workers)
+    throttles   = limiter.throttles
+    next_off    = start + fetched
+    gaps        = []
+    if fetched and next_off < end:
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            pending = {}
+            try:
+                while gaps or next_off < end or pending:
+                    while (gaps or next_off < end) and len(pending) < int(window):
+                        if gaps:
+                            off, limit = gaps.pop()
+                        else:
+                            off, limit = next_off, min(sizer.limit, end - next_off)
+                            next_off  += limit
+                        pending[pool.submit(fetch_chunk, off, limit)] = (off, limit)
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        off, limit = pending.pop(future)
+                        chunk      = future.result()
+                        fetched   += len(chunk)
+                        sink(off, chunk)
+                        if 0 < len(chunk) < limit and off + len(chunk) < end:
+                            sizer.cap(len(chunk))
+                            gaps.append((off + len(chunk), limit - len(chunk)))
+                    if limiter.throttles != throttles:
+                        throttles = limiter.throttles
+                        window    = max(1.0, window / 2)
+                    else:
+                        window = min(max_workers, window + len(done) / window)
+                    if progress: progress(fetched, total)
+            except BaseException:
+                for f in pending: f.cancel()
+                raise
+    return fetched
+
+class PartialFrame:
+    """
+    The pages of an in-memory fetch as they arrive, for other threads to
+    show while it runs: rows and memory so far, and the contiguous head of
+    the rows (pages land out of order). `cancel()` makes the fetch's next
+    page raise FetchCancelled; `close()` releases the pages once the fetch
+    has them all, so they are not held through compaction.
+    """
+    def __init__(self):
+        self.complete  = False
+        self.cancelled = threading.Event()
+        self._chunks   = {}      # offset -> chunk
+        self._sizes    = {}      # offset -> deep memory, measured on first read
+        self._rows     = 0
+        self._lock     = threading.Lock()
+
+    def add(self, offset, chunk):
+        if self.cancelled.is_set():
+            raise FetchCancelled("fetch cancelled")
+        with self._lock:
+            self._chunks[offset] = chunk
+            self._rows += len(chunk)
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def close(self):
+        with self._lock:
+            self.complete = True
+            self._chunks  = {}
+            self._sizes   = {}
+
+    @property
+    def num_rows(self):
+        return self._rows
+
+    @property
+    def nbytes(self):
+        with self._lock:
+            for off, chunk in self._chunks.items():
+                if off not in self._sizes: self._sizes[off] = int(chunk.memory_usage(deep=True).sum())
+            return sum(self._sizes.values())
+
+    def _head_chunks(self, n=None):
+        with self._lock:
+            chunks, end = [], None
+            for off in sorted(self._chunks):
+                if end is not None and off != end: break
+                chunks.append(self._chunks[off])
+                end = off + len(self._chunks[off])
+                if n is not None and end - min(self._chunks) >= n: break
+            return chunks
+
+    def head(self, n):
+        chunks = self._head_chunks(n)
+        return pd.concat(chunks, ignore_index=True).head(n) if chunks else pd.DataFrame()
+
+    def frame(self):
+        """Every row up to the first missing page, as one frame."""
+        chunks = self._head_chunks()
+        return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+
+
+def partial_sink(chunks, partial):
+    """The sink for stream_records that also hands each page to `partial`, if there is one."""
+    if partial is None: return chunks.__setitem__
+    def sink(off, chunk):
+        partial.add(off, chunk)
+        chunks[off] = chunk
+    return sink
+
+def collect_chunks(chunks, kind):
+    """
+    Concatenate chunks in offset order, recording the DataFrame memory held
+    at the peak: every chunk plus the new frame's own arrays (text values
+    are shared, not copied, by the concat).
+    """
+    held = sum(int(chunk.memory_usage(deep=True).sum()) for chunk in chunks.values())
+    df   = pd.concat([chunks.pop(off) for off in sorted(chunks)], ignore_index=True)
+    metrics.fetch_peak_bytes.observe(held + int(df.memory_usage(deep=False).sum()), kind=kind)
+    return df
+
+def fetch_all_records(resource_id, max_rows=None, workers=None, start=0, query=None, progress=None, partial=None):
+    """
+    stream_records collected into one frame, chunks concatenated in offset
+    order. Pages are also added to `partial`, a PartialFrame, as they land.
+    """
+    chunks = {}
+    with metrics.fetch_seconds.time(kind="datastore"):
+        stream_records(resource_id, partial_sink(chunks, partial), max_rows=max_rows, workers=workers,
+                       start=start, query=query, progress=progress)
+        if partial is not None: partial.close()
+        df = collect_chunks(chunks, "datastore")
+    return df.head(max_rows) if max_rows else df
+
+def top_level_order(sql):
+    """
+    The expressions of the statement's own ORDER BY, or None. Clauses inside
+    parentheses (subqueries, CTEs, window functions), quotes and comments
+    are not the statement's.
+    """
+    depth, masked, pos = 0, [], 0
+    for m in SQL_NESTED.finditer(sql):
+        masked.append(sql[pos:m.start()] if depth == 0 else " " * (m.start() - pos))
+        depth = max(depth + {"(": 1, ")": -1}.get(m.group(), 0), 0)
+        masked.append(" " * (m.end() - m.start()))
+        pos = m.end()
+    masked.append(sql[pos:] if depth == 0 else " " * (len(sql) - pos))
+    masked = "".join(masked)
+    orders = list(ORDER_BY.finditer(masked))
+    if not orders:
+        return None
+    start = orders[-1].end()
+    end   = ORDER_END.search(masked, start)
+    return sql[start:end.start() if end else len(sql)].strip() or None
+
+def stream_sql_records(sql, sink, max_rows=None, progress=None):
+    """
+    Run a datastore_search_sql statement, paging it by wrapping it in
+    LIMIT/OFFSET with page sizes from a PageSizer, and pass each chunk to
+    `sink(offset, chunk)`. Postgres keeps no row order between statements,
+    so the wrapper repeats the statement's own ORDER BY, if any, and breaks
+    ties on _id when it is selected or on the whole row's text otherwise.
+    The row count is unknown up front, so pages are sequential and
+    `progress` receives None as the total. Returns the number of rows fetched.
+    """
+    limiter  = shared_rate_limiter()
+    sizer    = PageSizer()
+    base     = sql.strip().rstrip(";")
+    fields   = api_result(config.SQL_URL, {"sql": f"SELECT * FROM ({base}) AS q LIMIT 0"}, limiter).get("fields", [])
+    tiebreak = '"_id"' if any(f["id"] == "_id" for f in fields) else "q::text"
+    own      = top_level_order(base)
+    order    = f" ORDER BY {own}, {tiebreak}" if own else f" ORDER BY {tiebreak}"
+    fetched  = 0
+    while True:
+        limit    = min(sizer.limit, max_rows - fetched) if max_rows else sizer.limit
+        stmt     = f"SELECT * FROM ({base}) AS q{order} LIMIT {limit} OFFSET {fetched}"
+        measured = []
+        result   = api_result(config.SQL_URL, {"sql": stmt}, limiter,
+                              meter=lambda nbytes, seconds: measured.append((nbytes, seconds)))
+        if measured: sizer.observe(len(result["records"]), *measured[0])
+        sink(fetched, records_to_frame(result["records"], result.get("fields", [])))
+        fetched += len(result["records"])
+        if progress: progress(fetched, None)
+        # A page cut short by the portal's own row cap is not the last page.
+        if result.get("records_truncated") and result["records"]:
+            sizer.cap(len(result["records"]))
+            continue
+        if len(result["records"]) < limit or (max_rows and fetched >= max_rows): break
+    return fetched
+
+def fetch_sql_records(sql, max_rows=None, progress=None, partial=None):
+    chunks = {}
+    with metrics.fetch_seconds.time(kind="sql"):
+        stream_sql_records(sql, partial_sink(chunks, partial), max_rows=max_rows, progress=progress)
+        if partial is not None: partial.close()
+        return collect_chunks(chunks, "sql")
+
+def same_value(cached, fetched):
+    """Whether a compacted cached cell holds the raw JSON value `fetched`."""
+    missing = lambda v: not isinstance(v, (list, dict)) and bool(pd.isna(v))
+    if missing(cached) or missing(fetched):
+        return missing(cached) and missing(fetched)
+    try:
+        if isinstance(cached, (bool, np.bool_)): return str(fetched).strip().lower() == str(cached).lower()
+        if isinstance(cached, pd.Timestamp):     return cached == pd.Timestamp(fetched)
+        if isinstance(cached, (int, float, np.number)): return float(cached) == float(fetched)
+    except (TypeError, ValueError):
+        return False
+    return str(cached) == str(fetched)
+
+def same_row(cached_row, records):
+    """Whether a probe's single record matches a cached row in every column."""
+    return len(records) == 1 and all(same_value(cached_row[col], records[0].get(col)) for col in cached_row.index)
+
+def sync_resource(resource_id, cached, progress=None):
+    """
+    Append the rows added since `cached` was stored. The datastore assigns
+    _id in insertion order, so for an append-only table the cached rows are
+    exactly the first len(cached) rows sorted by _id; the first and last
+    cached rows are compared with the portal's in full. Returns None when a
+    deletion, a reload, a schema change or a failed request means the table
+    must be fetched in full.
+    """
+    n = len(cached)
+    if n == 0:
+        return None
+    limiter = shared_rate_limiter()
+    last    = fetch_page(resource_id, offset=n - 1, limit=1, limiter=limiter)
+    if last is None or not last.get("success"):
+        return None
+    result  = last["result"]
+    columns = {f["id"] for f in result.get("fields", [])}
+    if columns != set(cached.columns) or result["total"] < n or not same_row(cached.iloc[-1], result["records"]):
+        return None
+    # A truncated and reloaded table restarts _id at 1 and can pass the check
+    # above; its first row almost always differs from the cached one.
+    first = fetch_page(resource_id, offset=0, limit=1, limiter=limiter) if n > 1 else last
+    if first is None or not first.get("success") or not same_row(cached.iloc[0], first["result"]["records"]):
+        return None
+    if result["total"] == n:
+        return cached
+    try:
+        new = fetch_all_records(resource_id, start=n, progress=progress)
+    except FetchError:
+        return None
+    # Compact the new rows like the cached ones so their dtypes line up for the concat.
+    return pd.concat([cached, compact_frame(new[cached.columns])], ignore_index=True)
@@ -0,0 +1,200 @@
+"""
+On-disk Parquet cache of fetched resources, shared by every session and
+batch job in the process, and the loaders that sit in front of it.
+"""
+import json
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from . import config, metrics
+from .api import fetch_all_records, fetch_sql_records, get_resource_meta, sync_resource
+from .compact import compact_frame, drop_id, head_rows, without_memory_stats
+from .export import write_parquet
+from .flight import flight_key, shared_flights
+
+ROW_GROUP_ROWS = 64_000     # cached tables are written in row groups this size so a head reads only the first
+
+
+def read_json(path: Path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+def write_json(path: Path, obj):
+    """Write via a temporary file so readers never see a half-written document."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+    tmp.write_text(json.dumps(obj))
+    tmp.replace(path)
+
+
+def read_head(path, n):
+    """
+    The first n rows of a Parquet file, decoding row groups only until it
+    has them, without the whole table's memory figures.
+    """
+    parquet = pq.ParquetFile(path)
+    batches, rows = [], 0
+    for batch in parquet.iter_batches(batch_size=min(n, ROW_GROUP_ROWS)):
+        batches.append(batch)
+        rows += batch.num_rows
+        if rows >= n: break
+    df = pa.Table.from_batches(batches, schema=parquet.schema_arrow).slice(0, n).to_pandas()
+    df.attrs = without_memory_stats(df.attrs)
+    return df
+
+
+class ResourceCache:
+    """
+    Parquet copies of fetched resources, shared by every session.
+    Entries are keyed by resource id and tagged with the resource's
+    last_modified, so an updated resource is a miss. Least recently
+    used entries are evicted once the cache grows past max_bytes.
+    """
+    def __init__(self, root: Path, max_bytes: int):
+        self.root        = root
+        self.max_bytes   = max_bytes
+        self.hits        = 0
+        self.misses      = 0
+        self._lock       = threading.Lock()
+        self._index_path = root / "index.json"
+        root.mkdir(parents=True, exist_ok=True)
+        self._index = read_json(self._index_path) or {}
+
+    def _path(self, resource_id):
+        return self.root / f"{resource_id}.parquet"
+
+    def _save_index(self):
+        write_json(self._index_path, self._index)
+
+    def _evict(self, keep):
+        total = sum(e["bytes"] for e in self._index.values())
+        for rid in sorted(self._index, key=lambda r: self._index[r]["last_access"]):
+            if total <= self.max_bytes: break
+            if rid == keep: continue
+            total -= self._index.pop(rid)["bytes"]
+            self._path(rid).unlink(missing_ok=True)
+
+    def get(self, resource_id, version, max_rows=None):
+        """Return the cached frame (first max_rows rows) or None on a miss."""
+        with self._lock:
+            entry  = self._index.get(resource_id)
+            usable = (entry is not None and version is not None
+                      and entry["version"] == version
+                      and (entry["complete"] or (max_rows and entry["rows"] >= max_rows))
+                      and self._path(resource_id).exists())
+            if not usable:
+                self.misses += 1
+                metrics.cache_lookups.inc(cache="resource", result="miss")
+                return None
+            self.hits += 1
+            metrics.cache_lookups.inc(cache="resource", result="hit")
+            entry["last_access"] = time.time()
+            rows = entry["rows"]
+            self._save_index()
+        if max_rows and max_rows < rows:
+            return read_head(self._path(resource_id), max_rows)
+        return pd.read_parquet(self._path(resource_id))
+
+    def get_stale(self, resource_id):
+        """Return a complete cached copy whatever its version, as the base for a delta sync."""
+        with self._lock:
+            entry = self._index.get(resource_id)
+            if entry is None or not entry["complete"] or not self._path(resource_id).exists():
+                return None
+        df = pd.read_parquet(self._path(resource_id))
+        return df if "_id" in df.columns else None
+
+    def put(self, resource_id, version, df, complete):
+        if version is None: return
+        path = self._path(resource_id)
+        tmp  = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+        try:
+            write_parquet(df, tmp, row_group_size=ROW_GROUP_ROWS)
+        except Exception:
+            tmp.unlink(missing_ok=True)
+            return
+        with self._lock:
+            tmp.replace(path)
+            self._index[resource_id] = {
+                "version": version, "rows": len(df), "complete": complete,
+                "bytes": path.stat().st_size, "last_access": time.time(),
+            }
+            self._evict(keep=resource_id)
+            self._save_index()
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._index),
+                    "bytes": sum(e["bytes"] for e in self._index.values())}
+
+
+_cache      = None
+_cache_lock = threading.Lock()
+
+def shared_resource_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResourceCache(config.CACHE_DIR / "resources", config.CACHE_MAX_BYTES)
+        return _cache
+
+
+def load_cached_resource(resource_id, max_rows=None, progress=None, partial=None):
+    """
+    Serve a resource from the disk cache while its last_modified is unchanged.
+    With config.INCREMENTAL_SYNC a changed resource is first brought up to
+    date with a delta sync; otherwise, or when that is not possible, it is
+    fetched in full. The result is stored
+    for every later session, already compacted.
+    """
+    cache   = shared_resource_cache()
+    version = get_resource_meta(resource_id)[3]
+    df      = cache.get(resource_id, version, max_rows)
+    if df is not None:
+        return df
+    stale = cache.get_stale(resource_id) if version and config.INCREMENTAL_SYNC else None
+    df    = sync_resource(resource_id, stale, progress) if stale is not None else None
+    if df is not None:
+        complete = True
+    else:
+        df       = fetch_all_records(resource_id, max_rows=max_rows, progress=progress, partial=partial)
+        complete = not max_rows or len(df) < max_rows
+    if not df.empty:
+        df = compact_frame(df)
+        cache.put(resource_id, version, df, complete=complete)
+    return head_rows(df, max_rows) if max_rows else df
+
+def load_resource(resource_id, max_rows=None, query=None, progress=None, preview=None):
+    """
+    Rows of a resource, compacted, with _id dropped. Server-side queries only
+    return a slice, so they bypass the cache. Concurrent identical loads share
+    one fetch and one read-only result; `preview(partial)` is called with the
+    PartialFrame of rows fetched so far as pages land. Raises FetchError if
+    the portal fails.
+    """
+    return shared_flights().do(flight_key(resource_id, max_rows, query),
+                               lambda report, partial: load_resource_direct(resource_id, max_rows, query, report, partial),
+                               progress, preview)
+
+def load_resource_direct(resource_id, max_rows, query, progress, partial=None):
+    if query and "sql" in query:
+        df = compact_frame(fetch_sql_records(query["sql"], max_rows, progress=progress, partial=partial))
+    elif query:
+        df = compact_frame(fetch_all_records(resource_id, max_rows=max_rows, query=query, progress=progress,
+                                             partial=partial))
+    else:
+        df = load_cached_resource(resource_id, max_rows, progress=progress, partial=partial)
+    return drop_id(df)
+
+def partial_resource(partial):
+    """The rows a cancelled load_resource kept (the head of its PartialFrame), compacted the same way."""
+    df = partial.frame()
+    return drop_id(compact_frame(df)) if not df.empty else df
@@ -0,0 +1,113 @@
+"""
+The package catalog: parallel full loads, persisted copies and incremental refreshes.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import config, metrics
+from .api import api_get, api_result, shared_rate_limiter
+from .cache import read_json, write_json
+
+log = logging.getLogger(__name__)
+
+
+def fetch_catalog_page(start, limiter, sort, fq=None):
+    params = {"rows": config.CATALOG_PAGE_SIZE, "start": start, "sort": sort}
+    if fq: params["fq"] = fq
+    data = api_get(config.PACKAGE_SEARCH, params, limiter)
+    if data is None or not data.get("success"):
+        log.warning("package_search page at offset %d failed%s", start, f" ({fq})" if fq else "")
+        return None
+    return data["result"]
+
+def fetch_full_catalog(limiter):
+    """
+    Fetch every package, pages in parallel once `count` is known. Pages are
+    ordered by creation so offsets stay put while packages are edited, and
+    pages from an interrupted attempt are saved and reused by the next one.
+    Returns None unless the whole catalog was retrieved.
+    """
+    page_size    = config.CATALOG_PAGE_SIZE
+    sort         = "metadata_created asc, id asc"
+    partial_path = config.CACHE_DIR / "catalog.partial.json"
+    first        = fetch_catalog_page(0, limiter, sort)
+    if first is None:
+        return None
+    count   = first["count"]
+    partial = read_json(partial_path) or {}
+    pages   = partial.get("pages", {}) if partial.get("count") == count else {}
+    pages["0"] = first["results"]
+    missing = [o for o in range(page_size, count, page_size) if str(o) not in pages]
+    with ThreadPoolExecutor(max_workers=config.FETCH_WORKERS) as pool:
+        results = pool.map(lambda o: fetch_catalog_page(o, limiter, sort), missing)
+        for offset, result in zip(missing, results):
+            if result is not None: pages[str(offset)] = result["results"]
+    if any(str(o) not in pages for o in missing):
+        write_json(partial_path, {"count": count, "pages": pages})
+        log.warning("catalog load incomplete: %d of %d pages saved for the next attempt",
+                    len(pages), len(missing) + 1)
+        return None
+    partial_path.unlink(missing_ok=True)
+    by_id = {pkg["id"]: pkg for o in sorted(pages, key=int) for pkg in pages[o]}
+    return sorted(by_id.values(), key=lambda p: p.get("metadata_modified") or "", reverse=True)
+
+def refresh_catalog(packages, watermark, limiter):
+    """Merge in the packages modified since `watermark`; None if a page fails."""
+    fq      = f"metadata_modified:[{watermark[:19]}Z TO *]"
+    by_id   = {pkg["id"]: pkg for pkg in packages}
+    fetched = 0
+    while True:
+        result = fetch_catalog_page(fetched, limiter, "metadata_modified desc", fq=fq)
+        if result is None:
+            return None
+        by_id.update((pkg["id"], pkg) for pkg in result["results"])
+        fetched += len(result["results"])
+        if not result["results"] or fetched >= result["count"]: break
+    return sorted(by_id.values(), key=lambda p: p.get("metadata_modified") or "", reverse=True)
+
+def load_catalog():
+    """
+    The package catalog, persisted under CACHE_DIR. A stored copy only pulls
+    packages modified since its last sync; the full fetch runs on first use
+    and every CATALOG_FULL_REFRESH seconds so deleted packages drop out.
+    If a refresh fails the stored copy is returned rather than a partial one.
+    """
+    limiter = shared_rate_limiter()
+    path    = config.CACHE_DIR / "catalog.json"
+    stored  = read_json(path)
+    now     = time.time()
+    if (stored and stored["packages"] and stored["watermark"]
+            and now - stored["full_at"] < config.CATALOG_FULL_REFRESH):
+        mode     = "refresh"
+        packages = refresh_catalog(stored["packages"], stored["watermark"], limiter)
+        full_at  = stored["full_at"]
+    else:
+        mode     = "full"
+        packages = fetch_full_catalog(limiter)
+        full_at  = now
+    if not packages:
+        metrics.cache_lookups.inc(cache="catalog", result="stale" if stored else "failed")
+        log.warning("catalog %s failed, %s", mode,
+                    f"serving the stored copy of {len(stored['packages'])} packages" if stored else "no stored copy")
+        return stored["packages"] if stored else []
+    metrics.cache_lookups.inc(cache="catalog", result=mode)
+    write_json(path, {
+        "full_at":   full_at,
+        "watermark": packages[0].get("metadata_modified") or "",
+        "packages":  packages,
+    })
+    return packages
+
+def search_packages(query):
+    """Every package matching a package_search `q`. Raises FetchError on failure."""
+    limiter  = shared_rate_limiter()
+    packages = []
+    while True:
+        result = api_result(config.PACKAGE_SEARCH, {
+            "q": query, "rows": config.CATALOG_PAGE_SIZE, "start": len(packages),
+            "sort": "metadata_modified desc",
+        }, limiter)
+        packages.extend(result["results"])
+        if not result["results"] or len(packages) >= result["count"]: break
+    return packages
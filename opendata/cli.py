@@ -0,0 +1,188 @@
+"""
+Headless bulk downloads.
+
+    python -m opendata RESOURCE_OR_DATASET ... [--search QUERY] [-o DIR] [-f FORMAT]
+
+Targets may be resource ids, dataset names or dataset ids; --search adds
+every dataset matching a catalog query. Each datastore resource is fetched
+(through the shared cache) and written to the output directory. A
+manifest.json there records what was written, so a rerun skips resources
+that are already done and unchanged, with the same format, compression and
+row limit, and retries the ones that failed.
+"""
+import argparse
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from . import config, metrics
+from .api import FetchError, get_package, get_resource
+from .cache import load_resource, read_json, write_json
+from .catalog import search_packages
+from .export import EXPORT_FORMATS, PARQUET_COMPRESSIONS, export_writer, find_geometry, gpd
+from .store import STORE_FORMATS, fetch_to_store
+
+log = logging.getLogger("opendata")
+
+
+def datastore_resources(pkg):
+    """(resource_id, name, version) for each resource of a package held in the datastore."""
+    return [(r["id"], r.get("name") or r["id"], r.get("last_modified") or r.get("metadata_modified"))
+            for r in pkg.get("resources", []) if r.get("datastore_active")]
+
+def resolve_targets(targets, search=None):
+    """
+    Resource ids, dataset names/ids and a catalog query → ({resource_id: (name, version)},
+    targets that matched nothing).
+    """
+    resolved, unknown = {}, []
+    for target in targets:
+        resource = get_resource(target)
+        if resource is not None:
+            resolved[resource["id"]] = (resource.get("name") or resource["id"],
+                                        resource.get("last_modified") or resource.get("metadata_modified"))
+            continue
+        pkg = get_package(target)
+        if pkg is None:
+            log.error("%s: not a resource or dataset", target)
+            unknown.append(target)
+            continue
+        for rid, name, version in datastore_resources(pkg):
+            resolved[rid] = (name, version)
+    if search:
+        for pkg in search_packages(search):
+            for rid, name, version in datastore_resources(pkg):
+                resolved[rid] = (name, version)
+    return resolved, unknown
+
+def output_name(name, resource_id, suffix):
+    slug = re.sub(r"[^\w.-]+", "_", name).strip("_")
+    return f"{slug}_{resource_id[:8]}.{suffix}"
+
+def download_to_store(resource_id, name, out_dir, fmt, compression, max_rows):
+    """download_resource for resources larger than memory: pages go to disk, then stream into the output."""
+    if fmt not in STORE_FORMATS:
+        log.warning("%s: %s needs the frame in memory, writing plain Parquet", name, fmt)
+        fmt = "parquet"
+    store = fetch_to_store(resource_id, max_rows=max_rows)
+    try:
+        if store.empty:
+            raise FetchError("no records")
+        path = out_dir / output_name(name, resource_id, EXPORT_FORMATS[fmt][1])
+        tmp  = path.with_name(path.name + ".part")
+        store.write(tmp, fmt, compression)
+        tmp.replace(path)
+        return path, store.num_rows
+    finally:
+        store.discard()
+
+def download_resource(resource_id, name, out_dir, fmt, compression, max_rows):
+    """Fetch one resource and write it atomically; returns (path, rows)."""
+    df = load_resource(resource_id, max_rows=max_rows)
+    if df.empty:
+        raise FetchError("no records")
+    geometry = None
+    if fmt == "geoparquet":
+        geometry = find_geometry(df)
+        if geometry is None or gpd is None:
+            log.warning("%s: no usable geometry (or geopandas missing), writing plain Parquet", name)
+            fmt = "parquet"
+    path = out_dir / output_name(name, resource_id, EXPORT_FORMATS[fmt][1])
+    tmp  = path.with_name(path.name + ".part")
+    export_writer(fmt, compression, geometry)(df, tmp)
+    tmp.replace(path)
+    return path, len(df)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m opendata",
+        description="Download Montréal open data resources in bulk.")
+    parser.add_argument("targets", nargs="*", help="resource ids, dataset names or dataset ids")
+    parser.add_argument("-s", "--search", help="also download every dataset matching this catalog query")
+    parser.add_argument("-o", "--out-dir", type=Path, default=Path("downloads"))
+    parser.add_argument("-f", "--format", choices=list(EXPORT_FORMATS), default="parquet")
+    parser.add_argument("--compression", choices=PARQUET_COMPRESSIONS, default="zstd",
+                        help="Parquet/GeoParquet compression")
+    parser.add_argument("--max-rows", type=int, help="rows per resource (default: all)")
+    parser.add_argument("-j", "--jobs", type=int, default=2, help="resources downloaded at once")
+    parser.add_argument("--workers", type=int, default=config.FETCH_WORKERS,
+                        help="concurrent page requests per resource")
+    parser.add_argument("--out-of-core", action="store_true",
+                        help="stream pages through disk instead of memory (no GeoParquet; bypasses the cache)")
+    parser.add_argument("--cache-dir", type=Path, default=config.CACHE_DIR)
+    parser.add_argument("--api-base", default=config.API_BASE,
+                        help="CKAN action API root (default: $MTL_API_BASE or the Montréal portal)")
+    parser.add_argument("--incremental", action="store_true", default=config.INCREMENTAL_SYNC,
+                        help="bring changed cached resources up to date with only their new rows (append-only tables)")
+    parser.add_argument("--force", action="store_true", help="ignore the manifest and download everything")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+    if not args.targets and not args.search:
+        parser.error("give at least one target or --search")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(asctime)s %(levelname)s %(message)s")
+    config.CACHE_DIR        = args.cache_dir
+    config.use_api_base(args.api_base)
+    config.FETCH_WORKERS    = args.workers
+    config.INCREMENTAL_SYNC = args.incremental
+    config.POOL_SIZE        = max(config.POOL_SIZE, args.workers * args.jobs)
+    metrics.serve_from_env()
+    args.out_dir.mkdir(parents=True, exist_ok=True)
+
+    manifest_path = args.out_dir / "manifest.json"
+    manifest      = read_json(manifest_path) or {}
+    manifest_lock = threading.Lock()
+
+    try:
+        targets, unknown = resolve_targets(args.targets, args.search)
+    except FetchError as e:
+        log.error("catalog search failed: %s", e)
+        return 1
+
+    # Everything that shapes an output file; a done entry is reused only if all of it matches.
+    options = {"format": args.format, "max_rows": args.max_rows,
+               "compression": args.compression if args.format in ("parquet", "geoparquet") else None}
+
+    def is_done(rid, version):
+        entry = manifest.get(rid)
+        return (not args.force and entry is not None and entry["status"] == "done"
+                and entry["version"] == version and all(entry.get(k) == v for k, v in options.items())
+                and (args.out_dir / entry["file"]).exists())
+
+    def record(rid, **entry):
+        with manifest_lock:
+            manifest[rid] = entry
+            write_json(manifest_path, manifest)
+
+    def run(rid, name, version):
+        started = time.monotonic()
+        download = download_to_store if args.out_of_core else download_resource
+        try:
+            path, rows = download(rid, name, args.out_dir, args.format, args.compression, args.max_rows)
+        except Exception as e:
+            log.error("%s (%s): %s", name, rid, e)
+            record(rid, name=name, version=version, **options, status="failed", error=str(e))
+            return False
+        log.info("%s: %s rows → %s (%.1f s)", name, f"{rows:,}", path.name, time.monotonic() - started)
+        record(rid, name=name, version=version, **options, status="done", file=path.name, rows=rows)
+        return True
+
+    pending = {rid: meta for rid, meta in targets.items() if not is_done(rid, meta[1])}
+    log.info("%d resource(s): %d to download, %d already done",
+             len(targets), len(pending), len(targets) - len(pending))
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as pool:
+        futures = [pool.submit(run, rid, name, version) for rid, (name, version) in pending.items()]
+        for future in as_completed(futures):
+            failed += not future.result()
+    if args.verbose:
+        metrics.log_summary(logging.DEBUG)
+    if failed:
+        log.error("%d resource(s) failed; rerun the same command to retry them", failed)
+    return 1 if failed or unknown or not targets else 0
@@ -0,0 +1,168 @@
+"""
+Memory compaction of fetched frames. records_to_frame already applies the
+types the datastore declares; this pass handles what the schema leaves as
+text (often every column) and shrinks the rest.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+from . import config
+
+SAMPLE_ROWS        = 1_000
+CATEGORY_MAX_RATIO = 0.5
+BOOL_VALUES        = {"true": True, "false": False}
+LEADING_ZERO       = re.compile(r"^[+-]?0\d")    # codes like 00123 must stay text
+UTC_OFFSET         = r"(?:Z|[+-]\d{2}:?\d{2})$"
+FLOAT_DIGITS       = 15      # significant decimal digits that always survive float64
+
+
+def is_text(series):
+    return not isinstance(series.dtype, pd.CategoricalDtype) and (
+        pd.api.types.is_object_dtype(series) or pd.api.types.is_string_dtype(series))
+
+def infer_text(series):
+    """
+    A typed copy of a text column whose sampled values all read as booleans,
+    numbers or ISO dates, or None. The sample only proposes a type; it is
+    kept only if converting the full column loses no value.
+    """
+    values = series.dropna()
+    sample = values.head(SAMPLE_ROWS)
+    if sample.empty or pd.api.types.infer_dtype(sample, skipna=True) != "string":
+        return None
+    stripped = sample.str.strip()
+    if stripped.str.lower().isin(BOOL_VALUES).all():
+        lowered = series.str.strip().str.lower()
+        if lowered.dropna().isin(BOOL_VALUES).all():
+            return lowered.map(BOOL_VALUES).astype("boolean")
+        return None
+    if not stripped.str.match(LEADING_ZERO).any() and pd.to_numeric(stripped, errors="coerce").notna().all():
+        text = series.str.strip()
+        if text.dropna().str.match(LEADING_ZERO).any():
+            return None
+        numbers = pd.to_numeric(text, errors="coerce")
+        if numbers.notna().sum() == len(values) and exact_numbers(numbers, values):
+            return numbers
+        return None
+    if stripped.str.contains(r"^\d{4}-\d{2}-\d{2}", regex=True).all():
+        dates = to_dates(series, values)
+        if dates is not None and dates.notna().sum() == len(values):
+            return dates
+    return None
+
+def exact_numbers(numbers, values):
+    """
+    Whether `numbers` holds every value of the text `values` exactly: int64
+    does, float64 only when no value has more than FLOAT_DIGITS significant
+    digits (long identifiers and cadastral numbers would be rounded).
+    """
+    if pd.api.types.is_integer_dtype(numbers): return True
+    if not pd.api.types.is_float_dtype(numbers): return False      # beyond int64 and uint64
+    digits = (values.str.strip().str.replace(r"[eE].*$", "", regex=True)
+              .str.replace(r"\D", "", regex=True).str.lstrip("0"))
+    return bool((digits.str.len() <= FLOAT_DIGITS).all())
+
+def to_dates(series, values):
+    """
+    ISO dates parsed as they are; timestamps with differing UTC offsets (EST
+    and EDT in one column) are converted to UTC. None if neither works.
+    """
+    try:
+        return pd.to_datetime(series, errors="coerce", format="ISO8601")
+    except ValueError:
+        # Only when every value has an offset: naive ones would be read as UTC.
+        if not values.str.strip().str.contains(UTC_OFFSET, regex=True).all():
+            return None
+    try:
+        return pd.to_datetime(series, errors="coerce", format="ISO8601", utc=True)
+    except ValueError:
+        return None
+
+def downcast(series):
+    """The smallest numeric dtype that holds every value exactly."""
+    if pd.api.types.is_bool_dtype(series):
+        return series
+    if pd.api.types.is_float_dtype(series):
+        values   = series.dropna()
+        integral = len(values) and np.isfinite(values).all() and (values % 1 == 0).all()
+        if integral and values.abs().max() < 2 ** 53:
+            series = series.astype("Int64")
+        else:
+            small = series.astype("float32")
+            return small if (small.astype("float64") == series).sum() == len(values) else series
+    if pd.api.types.is_integer_dtype(series):
+        nullable = isinstance(series.dtype, pd.api.extensions.ExtensionDtype)
+        smaller  = pd.to_numeric(series, downcast="integer")
+        if nullable and not isinstance(smaller.dtype, pd.api.extensions.ExtensionDtype):
+            smaller = smaller.astype(smaller.dtype.name.capitalize())
+        return smaller
+    return series
+
+def compact_column(series, arrow_strings):
+    if is_text(series):
+        typed = infer_text(series)
+        if typed is not None:
+            return downcast(typed) if pd.api.types.is_numeric_dtype(typed) else typed
+        non_null = series.notna().sum()
+        try:
+            distinct = series.nunique(dropna=True)
+        except TypeError:      # dicts or lists: leave as they are
+            return series
+        if non_null and distinct <= CATEGORY_MAX_RATIO * non_null:
+            return series.astype("category")
+        if arrow_strings and pd.api.types.is_object_dtype(series) \
+                and pd.api.types.infer_dtype(series, skipna=True) == "string":
+            return series.astype("string[pyarrow]")
+        return series
+    if pd.api.types.is_numeric_dtype(series):
+        return downcast(series)
+    return series
+
+def compact_frame(df, arrow_strings=None):
+    """
+    Convert text columns to booleans, numbers, dates or categories where
+    their values allow, store remaining text as Arrow strings
+    (config.ARROW_STRINGS) and downcast numbers. Memory before and after
+    is recorded in df.attrs["memory_before"] / ["memory_after"], and before
+    per column in ["memory_before_columns"]; slice the result with
+    head_rows and drop_columns so the figures keep describing it.
+    """
+    arrow_strings = config.ARROW_STRINGS if arrow_strings is None else arrow_strings
+    before = df.memory_usage(deep=True)
+    df     = pd.DataFrame({col: compact_column(df[col], arrow_strings) for col in df.columns}, index=df.index)
+    df.attrs["memory_before"]         = int(before.sum())
+    df.attrs["memory_before_columns"] = {str(col): int(n) for col, n in before.items()}
+    df.attrs["memory_after"]          = int(df.memory_usage(deep=True).sum())
+    return df
+
+def without_memory_stats(attrs):
+    return {k: v for k, v in attrs.items() if not k.startswith("memory_")}
+
+def head_rows(df, n):
+    """
+    df.head(n). Memory saved by compaction is only known for the whole
+    frame, so a slice that cuts rows does not carry the figures over.
+    """
+    head = df.head(n)
+    if len(head) < len(df):
+        head.attrs = without_memory_stats(df.attrs)
+    return head
+
+def drop_columns(df, columns):
+    """df without `columns`, its memory figures restated for the columns kept."""
+    out   = df.drop(columns=columns)
+    sizes = df.attrs.get("memory_before_columns")
+    out.attrs = without_memory_stats(df.attrs)
+    if sizes and all(str(col) in sizes for col in out.columns):
+        out.attrs["memory_before_columns"] = {str(col): sizes[str(col)] for col in out.columns}
+        out.attrs["memory_before"] = sum(out.attrs["memory_before_columns"].values()) + sizes.get("Index", 0)
+        out.attrs["memory_after"]  = int(out.memory_usage(deep=True).sum())
+    return out
+
+def drop_id(df):
+    """df without the datastore's _id column, unless that is all it has."""
+    if "_id" in df.columns and len(df.columns) > 1:
+        df = drop_columns(df, ["_id"])
+    return df
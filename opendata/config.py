@@ -0,0 +1,64 @@
+"""
+Tunables for the fetch layer. Modules read them as `config.NAME` at call
+time, so the CLI (or a test) can override them after import.
+"""
+import os
+from pathlib import Path
+
+API_BASE         = os.environ.get("MTL_API_BASE", "https://donnees.montreal.ca/api/3/action/").rstrip("/") + "/"
+BASE_URL         = API_BASE + "datastore_search"
+PACKAGE_SEARCH   = API_BASE + "package_search"
+PACKAGE_SHOW     = API_BASE + "package_show"
+PACKAGE_URL      = API_BASE + "resource_show"
+SQL_URL          = API_BASE + "datastore_search_sql"
+MAX_RETRIES      = 5
+BACKOFF_BASE     = 2
+BACKOFF_MAX      = 60
+PAGE_SIZE        = 1_000      # first page; later pages are sized from measured ones
+PAGE_SIZE_MIN    = 100
+PAGE_SIZE_MAX    = 32_000     # CKAN's default datastore rows_max
+TARGET_PAGE_SECONDS = 2.0
+TARGET_PAGE_BYTES   = 8 * 1024 ** 2
+FETCH_WORKERS    = 4
+REQUESTS_PER_SEC = 4.0        # starting rate; adapts between the two bounds below
+MIN_REQUESTS_PER_SEC = 0.5
+MAX_REQUESTS_PER_SEC = 8.0
+POOL_SIZE        = 16
+CONNECT_TIMEOUT  = 10
+READ_TIMEOUTS    = {   # seconds, per CKAN action; "download" is for raw resource files
+    "datastore_search":     60,
+    "datastore_search_sql": 120,
+    "package_search":       30,
+    "package_show":         15,
+    "resource_show":        15,
+    "download":             60,
+}
+CSV_FORMATS      = {"CSV", "TSV", "XLS", "XLSX"}
+ARROW_STRINGS    = True       # text left after compaction is stored as Arrow strings
+CACHE_DIR        = Path(os.environ.get("MTL_CACHE_DIR", ".cache"))
+CACHE_MAX_BYTES  = 2 * 1024 ** 3
+EXPORT_MAX_AGE   = 24 * 3600
+EXPORT_CHUNK_ROWS = 50_000
+STORE_MAX_AGE    = 24 * 3600
+FILE_CACHE_MAX_BYTES = 2 * 1024 ** 3
+FILE_REVALIDATE  = 10 * 60    # seconds a cached raw file is served before a conditional request
+DOWNLOAD_CHUNK   = 1024 ** 2
+FILE_PREVIEW_ROWS = 1_000   # rows parsed from a file resource outside the datastore
+METRICS_PORT     = int(os.environ.get("MTL_METRICS_PORT") or 0) or None   # Prometheus endpoint, off when unset
+METRICS_ADDR     = os.environ.get("MTL_METRICS_ADDR", "127.0.0.1")   # the endpoint has no authentication
+METRICS_LOG_INTERVAL = float(os.environ.get("MTL_METRICS_LOG_INTERVAL") or 0)  # seconds between logged summaries; 0 = off
+ADMIN_PANEL      = os.environ.get("MTL_ADMIN_PANEL", "").lower() in ("1", "true", "yes")
+INCREMENTAL_SYNC = os.environ.get("MTL_INCREMENTAL_SYNC", "").lower() in ("1", "true", "yes")  # append-only tables only
+CATALOG_PAGE_SIZE    = 1_000
+CATALOG_FULL_REFRESH = 7 * 24 * 3600
+
+
+def use_api_base(base):
+    """Point every CKAN action URL at another portal, or at bench/mock_ckan.py."""
+    global API_BASE, BASE_URL, PACKAGE_SEARCH, PACKAGE_SHOW, PACKAGE_URL, SQL_URL
+    API_BASE       = base.rstrip("/") + "/"
+    BASE_URL       = API_BASE + "datastore_search"
+    PACKAGE_SEARCH = API_BASE + "package_search"
+    PACKAGE_SHOW   = API_BASE + "package_show"
+    PACKAGE_URL    = API_BASE + "resource_show"
+    SQL_URL        = API_BASE + "datastore_search_sql"
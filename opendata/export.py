@@ -0,0 +1,164 @@
+"""
+Serializing fetched frames: CSV, gzip CSV, Parquet, Feather and GeoParquet.
+"""
+import codecs
+import gzip
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+
+import pandas as pd
+
+from . import config, metrics
+
+try:
+    import geopandas as gpd
+except ImportError:
+    gpd = None
+
+EXPORT_FORMATS = {
+    "csv":        ("CSV",                 "csv",     "text/csv"),
+    "csv.gz":     ("CSV (gzip)",          "csv.gz",  "application/gzip"),
+    "parquet":    ("Parquet",             "parquet", "application/vnd.apache.parquet"),
+    "feather":    ("Feather (Arrow IPC)", "feather", "application/vnd.apache.arrow.file"),
+    "geoparquet": ("GeoParquet",          "parquet", "application/vnd.apache.parquet"),
+}
+PARQUET_COMPRESSIONS = ["snappy", "zstd", "gzip", "none"]
+GEOMETRY_COLUMNS = {"geometry", "geom", "the_geom", "wkt", "geojson", "shape"}
+LONLAT_COLUMNS   = [("longitude", "latitude"), ("long", "lat"), ("lon", "lat")]
+WKT_PREFIXES     = ("POINT", "LINESTRING", "POLYGON", "MULTIPOINT", "MULTILINESTRING",
+                    "MULTIPOLYGON", "GEOMETRYCOLLECTION")
+
+
+def with_string_fallback(write, df):
+    """Run an Arrow-based writer; if object columns mix types, retry with them as strings."""
+    try:
+        write(df)
+    except (ValueError, TypeError):
+        obj = df.select_dtypes(include="object").columns
+        write(df.astype({c: "string" for c in obj}))
+
+def write_parquet(df, path, **kwargs):
+    with_string_fallback(lambda frame: frame.to_parquet(path, index=False, **kwargs), df)
+
+@contextmanager
+def open_csv(path, compression=None):
+    """
+    The binary sink of every CSV export, in memory or out-of-core; `path`
+    may also be an open binary file. The BOM helps Excel; compressed exports
+    are meant for pipelines, so they skip it.
+    """
+    if hasattr(path, "write"):
+        out, owned = path, False
+    else:
+        out, owned = gzip.open(path, "wb") if compression == "gzip" else open(path, "wb"), True
+    try:
+        if not compression: out.write(codecs.BOM_UTF8)
+        yield out
+    finally:
+        if owned: out.close()
+
+def write_csv(df, path, compression=None):
+    with open_csv(path, compression) as out:
+        df.to_csv(out, index=False, encoding="utf-8", chunksize=config.EXPORT_CHUNK_ROWS)
+
+def write_feather(df, path):
+    with_string_fallback(lambda frame: frame.reset_index(drop=True).to_feather(path), df)
+
+def find_geometry(df):
+    """
+    ("wkt" | "geojson", column) for a column of WKT or GeoJSON geometries,
+    ("lonlat", (lon, lat)) for a longitude/latitude pair, or None.
+    """
+    for col in df.columns:
+        if str(col).lower() not in GEOMETRY_COLUMNS: continue
+        values = df[col].dropna()
+        if values.empty: continue
+        sample = values.iloc[0]
+        if isinstance(sample, dict) or (isinstance(sample, str) and sample.lstrip().startswith("{")):
+            return ("geojson", col)
+        if isinstance(sample, str) and sample.lstrip().upper().startswith(WKT_PREFIXES):
+            return ("wkt", col)
+    lower = {str(c).lower(): c for c in df.columns}
+    for lon, lat in LONLAT_COLUMNS:
+        if lon in lower and lat in lower:
+            cols = (lower[lon], lower[lat])
+            if all(pd.api.types.is_numeric_dtype(df[c]) for c in cols):
+                return ("lonlat", cols)
+    return None
+
+def write_geoparquet(df, path, geometry, compression=None):
+    """Write df as GeoParquet. Longitude/latitude pairs and GeoJSON are WGS84; WKT has no CRS."""
+    from shapely.geometry import shape
+    kind, col = geometry
+    if kind == "lonlat":
+        geo   = gpd.points_from_xy(df[col[0]], df[col[1]], crs="EPSG:4326")
+        frame = df
+    elif kind == "geojson":
+        geo   = gpd.GeoSeries(
+            [shape(json.loads(v) if isinstance(v, str) else v) if pd.notna(v) else None for v in df[col]],
+            index=df.index, crs="EPSG:4326")
+        frame = df.drop(columns=[col])
+    else:
+        geo   = gpd.GeoSeries.from_wkt(df[col].where(df[col].notna(), None))
+        frame = df.drop(columns=[col])
+    with_string_fallback(
+        lambda f: gpd.GeoDataFrame(f, geometry=geo).to_parquet(path, index=False, compression=compression),
+        frame)
+
+def metered(fmt, write):
+    """`write` with its duration and output size recorded under `fmt`."""
+    def run(df, path):
+        with metrics.serialize_seconds.time(format=fmt):
+            write(df, path)
+        metrics.serialize_bytes.inc(Path(path).stat().st_size, format=fmt)
+    return run
+
+def export_writer(fmt, compression=None, geometry=None):
+    """The (df, path) writer behind each EXPORT_FORMATS entry."""
+    compression = None if compression == "none" else compression
+    if fmt == "csv.gz":       write = partial(write_csv, compression="gzip")
+    elif fmt == "parquet":    write = partial(write_parquet, compression=compression)
+    elif fmt == "feather":    write = write_feather
+    elif fmt == "geoparquet": write = partial(write_geoparquet, geometry=geometry, compression=compression)
+    else:                     write, fmt = write_csv, "csv"
+    return metered(fmt, write)
+
+
+class FrameExport:
+    """
+    A fetched frame serialized to a file under CACHE_DIR/exports. The file
+    is written in row chunks the first time it is requested and reused after
+    that, so reruns never pay for serialization.
+    """
+    def __init__(self, df, suffix, write):
+        self._df     = df
+        self._suffix = suffix
+        self._write  = write
+        self._path   = None
+        self._lock   = threading.Lock()
+
+    def path(self) -> Path:
+        with self._lock:
+            if self._path is None or not self._path.exists():
+                export_dir = config.CACHE_DIR / "exports"
+                export_dir.mkdir(parents=True, exist_ok=True)
+                cutoff = time.time() - config.EXPORT_MAX_AGE
+                for old in export_dir.iterdir():
+                    if old.stat().st_mtime < cutoff: old.unlink(missing_ok=True)
+                path = export_dir / f"{uuid.uuid4().hex}.{self._suffix}"
+                self._write(self._df, path)
+                self._path = path
+            return self._path
+
+    def read(self) -> bytes:
+        return self.path().read_bytes()
+
+    def discard(self):
+        with self._lock:
+            if self._path is not None: self._path.unlink(missing_ok=True)
+            self._path = None
@@ -0,0 +1,159 @@
+"""
+Raw resource files (JSON, GeoJSON, XLSX, PDF…) streamed to a disk cache
+and revalidated with conditional requests instead of re-downloaded.
+"""
+import hashlib
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import requests
+
+from . import config, metrics
+from .api import FetchError, http_get
+from .cache import read_json, write_json
+
+
+class FileCache:
+    """
+    Files spooled to disk in DOWNLOAD_CHUNK pieces, keyed by URL, with the
+    response's ETag, Last-Modified and a SHA-256 of the content. An entry
+    checked within FILE_REVALIDATE seconds is served as is; an older one
+    is revalidated with If-None-Match / If-Modified-Since, and a 304 keeps
+    it. Least recently used files are evicted past max_bytes.
+    """
+    def __init__(self, root: Path, max_bytes: int):
+        self.root        = root
+        self.max_bytes   = max_bytes
+        self._lock       = threading.Lock()
+        self._url_locks  = {}
+        self._index_path = root / "index.json"
+        root.mkdir(parents=True, exist_ok=True)
+        self._index = read_json(self._index_path) or {}
+
+    @staticmethod
+    def _key(url):
+        return hashlib.sha1(url.encode()).hexdigest()
+
+    def _path(self, key):
+        return self.root / key
+
+    def _url_lock(self, key):
+        with self._lock:
+            return self._url_locks.setdefault(key, threading.Lock())
+
+    def _evict(self, keep):
+        total = sum(e["bytes"] for e in self._index.values())
+        for key in sorted(self._index, key=lambda k: self._index[k]["last_access"]):
+            if total <= self.max_bytes: break
+            if key == keep: continue
+            total -= self._index.pop(key)["bytes"]
+            self._path(key).unlink(missing_ok=True)
+
+    def entry(self, url):
+        with self._lock:
+            entry = self._index.get(self._key(url))
+            return dict(entry) if entry else None
+
+    def cached_path(self, url):
+        """Path of a copy of `url` still within FILE_REVALIDATE, or None; never touches the network."""
+        key  = self._key(url)
+        path = self._path(key)
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None or not path.exists() or time.time() - entry["checked_at"] >= config.FILE_REVALIDATE:
+                return None
+            entry["last_access"] = time.time()
+            return path
+
+    def fetch(self, url) -> Path:
+        """
+        Path of an up-to-date local copy of `url`. Concurrent calls for the
+        same URL share one download. Raises FetchError if the file cannot be
+        retrieved and no cached copy exists.
+        """
+        key  = self._key(url)
+        path = self._path(key)
+        with self._url_lock(key):
+            with self._lock:
+                entry = self._index.get(key)
+                if entry is not None and not path.exists():
+                    entry = None
+                if entry is not None and time.time() - entry["checked_at"] < config.FILE_REVALIDATE:
+                    entry["last_access"] = time.time()
+                    self._save()
+                    metrics.cache_lookups.inc(cache="file", result="fresh")
+                    return path
+            headers = {}
+            if entry is not None:
+                if entry.get("etag"):          headers["If-None-Match"]     = entry["etag"]
+                if entry.get("last_modified"): headers["If-Modified-Since"] = entry["last_modified"]
+            try:
+                result = self._download(url, key, headers, entry)
+            except (requests.RequestException, OSError) as e:
+                if entry is None:
+                    metrics.cache_lookups.inc(cache="file", result="failed")
+                    raise FetchError(f"download failed for {url}: {e}") from e
+                result = "stale"
+            metrics.cache_lookups.inc(cache="file", result=result)
+            return path
+
+    def _download(self, url, key, headers, entry):
+        with http_get(url, endpoint="download", headers=headers, stream=True) as resp:
+            if resp.status_code == 304 and entry is not None:
+                self._record(key, entry, resp)
+                return "revalidated"
+            resp.raise_for_status()
+            path   = self._path(key)
+            tmp    = path.with_suffix(f".{uuid.uuid4().hex}.tmp")
+            digest = hashlib.sha256()
+            size   = 0
+            try:
+                with open(tmp, "wb") as out:
+                    for chunk in resp.iter_content(config.DOWNLOAD_CHUNK):
+                        out.write(chunk)
+                        digest.update(chunk)
+                        size += len(chunk)
+            except BaseException:
+                tmp.unlink(missing_ok=True)
+                raise
+            finally:
+                metrics.http_bytes.inc(resp.raw.tell() or size, endpoint="download")
+            sha256 = digest.hexdigest()
+            # Same bytes under a new ETag: keep the existing file and its mtime.
+            if entry is not None and entry.get("sha256") == sha256:
+                tmp.unlink(missing_ok=True)
+            else:
+                tmp.replace(path)
+            self._record(key, {"url": url, "bytes": size, "sha256": sha256}, resp)
+            return "downloaded" if entry is None else "changed"
+
+    def _record(self, key, entry, resp):
+        now = time.time()
+        entry = {**entry,
+                 "etag":          resp.headers.get("ETag") or entry.get("etag"),
+                 "last_modified": resp.headers.get("Last-Modified") or entry.get("last_modified"),
+                 "checked_at":    now, "last_access": now}
+        with self._lock:
+            self._index[key] = entry
+            self._evict(keep=key)
+            self._save()
+
+    def _save(self):
+        write_json(self._index_path, self._index)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._index), "bytes": sum(e["bytes"] for e in self._index.values())}
+
+
+_files      = None
+_files_lock = threading.Lock()
+
+def shared_file_cache():
+    global _files
+    with _files_lock:
+        if _files is None:
+            _files = FileCache(config.CACHE_DIR / "files", config.FILE_CACHE_MAX_BYTES)
+        return _files
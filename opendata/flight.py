@@ -0,0 +1,116 @@
+"""
+Request coalescing: concurrent loads of the same resource, row limit and
+query share one fetch instead of each paging through the portal.
+"""
+import json
+import threading
+
+from . import metrics
+from .api import PartialFrame
+
+POLL_SECONDS = 0.2
+
+
+def flight_key(resource_id, max_rows=None, query=None):
+    """A hashable key for a load; the query dict is frozen as canonical JSON."""
+    return (resource_id, max_rows, json.dumps(query, sort_keys=True, default=str) if query else None)
+
+
+class Flight:
+    """One fetch in progress: its latest progress, the rows so far and, once done, its result or error."""
+    def __init__(self):
+        self.done     = threading.Event()
+        self.progress = (0, None)
+        self.partial  = PartialFrame()
+        self.waiters  = 0
+        self.result   = None
+        self.error    = None
+
+    def report(self, fetched, total):
+        self.progress = (fetched, total)
+
+
+class SingleFlight:
+    """
+    Runs each distinct load once at a time. The fetch runs on its own thread,
+    so a requester that goes away (a Streamlit rerun, a stopped script) never
+    cancels it for the others; every requester waits, relays the shared
+    progress and partial rows to its own callbacks and gets the same result
+    object, or the same exception. When the last requester goes away the
+    fetch is cancelled. Results are shared between sessions and must be
+    treated as read-only.
+    """
+    def __init__(self):
+        self.started   = 0
+        self.coalesced = 0
+        self._flights  = {}
+        self._lock     = threading.Lock()
+
+    def _run(self, key, flight, fn):
+        try:
+            flight.result = fn(flight.report, flight.partial)
+        except BaseException as e:
+            flight.error = e
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight: del self._flights[key]
+            flight.done.set()
+
+    def _leave(self, key, flight):
+        with self._lock:
+            flight.waiters -= 1
+            if flight.waiters or flight.done.is_set(): return
+            # Nobody is left to use the result; a new request starts afresh.
+            flight.partial.cancel()
+            if self._flights.get(key) is flight: del self._flights[key]
+            metrics.flights.inc(role="cancelled")
+
+    def do(self, key, fn, progress=None, preview=None):
+        """
+        The result of fn(progress, partial) for `key`, joining the call already
+        in flight if there is one. `preview(partial)` is called with the
+        flight's PartialFrame whenever more rows have arrived.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = Flight()
+                self.started += 1
+                metrics.flights.inc(role="leader")
+                threading.Thread(target=self._run, args=(key, flight, fn), daemon=True,
+                                 name=f"flight-{key[0]}").start()
+            else:
+                self.coalesced += 1
+                metrics.flights.inc(role="follower")
+            flight.waiters += 1
+        try:
+            seen, shown = None, 0
+            while not flight.done.wait(POLL_SECONDS):
+                if progress is not None and flight.progress != seen:
+                    seen = flight.progress
+                    progress(*seen)
+                if preview is not None and flight.partial.num_rows != shown:
+                    shown = flight.partial.num_rows
+                    preview(flight.partial)
+            if progress is not None and flight.progress != seen:
+                progress(*flight.progress)
+        finally:
+            self._leave(key, flight)
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def stats(self):
+        with self._lock:
+            return {"started": self.started, "coalesced": self.coalesced, "in_flight": len(self._flights)}
+
+
+_flights      = None
+_flights_lock = threading.Lock()
+
+def shared_flights():
+    global _flights
+    with _flights_lock:
+        if _flights is None:
+            _flights = SingleFlight()
+        return _flights
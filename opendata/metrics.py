@@ -0,0 +1,284 @@
+"""
+Counters and histograms for the fetch pipeline, exposed as Prometheus text
+(over HTTP when MTL_METRICS_PORT is set), as periodic summaries on the
+"opendata.metrics" logger and in the app's admin panel.
+"""
+import bisect
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from . import config
+
+try:
+    import resource
+except ImportError:      # not available on Windows
+    resource = None
+
+log = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES_BUCKETS   = tuple(2 ** p for p in range(16, 34, 2))    # 64 KiB … 4 GiB
+REGISTRY        = []
+
+
+def format_labels(labels):
+    if not labels: return ""
+    escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels) + "}"
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help):
+        self.name    = name
+        self.help    = help
+        self._values = {}      # sorted label items -> value
+        self._lock   = threading.Lock()
+        REGISTRY.append(self)
+
+    @staticmethod
+    def _key(labels):
+        return tuple(sorted(labels.items()))
+
+    def samples(self):
+        """(name, label items, value) triples for the text exposition."""
+        with self._lock:
+            return [(self.name, key, value) for key, value in sorted(self._values.items())]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, value=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def values(self):
+        """{label items: value}."""
+        with self._lock:
+            return dict(self._values)
+
+
+class Gauge(Metric):
+    """A value set directly, or read from `fn` whenever the metrics are collected."""
+    kind = "gauge"
+
+    def __init__(self, name, help, fn=None):
+        super().__init__(name, help)
+        self.fn = fn
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self):
+        if self.fn is not None:
+            try:
+                self.set(self.fn())
+            except Exception:
+                pass
+        return super().samples()
+
+
+class Histogram(Metric):
+    """Observations counted into fixed buckets, with their sum; quantiles are estimated from the buckets."""
+    kind = "histogram"
+
+    def __init__(self, name, help, buckets=LATENCY_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+            state["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            state["sum"]   += value
+            state["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def stats(self):
+        """{label items: {"count", "sum", "counts"}}."""
+        with self._lock:
+            return {key: {**state, "counts": list(state["counts"])} for key, state in self._values.items()}
+
+    def quantile(self, q, state):
+        """Upper bound of the bucket holding the q-th observation of one label set's stats."""
+        rank, seen = q * state["count"], 0
+        for bound, count in zip(self.buckets + (float("inf"),), state["counts"]):
+            seen += count
+            if seen >= rank and count:
+                return bound
+        return None
+
+    def samples(self):
+        lines = []
+        for key, state in sorted(self.stats().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state["counts"]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append((f"{self.name}_bucket", key + (("le", le),), cumulative))
+            lines.append((f"{self.name}_sum", key, state["sum"]))
+            lines.append((f"{self.name}_count", key, state["count"]))
+        return lines
+
+
+def peak_rss_bytes():
+    """The process's peak resident set size, or None where getrusage is unavailable."""
+    if resource is None: return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024      # bytes on macOS, KiB elsewhere
+
+
+http_requests     = Counter("opendata_http_requests_total", "HTTP requests by endpoint and status (error: no response)")
+http_seconds      = Histogram("opendata_http_request_seconds", "HTTP request latency by endpoint, to the full body unless streamed")
+http_bytes        = Counter("opendata_http_received_bytes_total", "Response body bytes received over the wire by endpoint")
+http_retries      = Counter("opendata_http_retries_total", "CKAN calls retried, by endpoint and reason (429, 503, error)")
+parse_seconds     = Histogram("opendata_page_parse_seconds", "JSON decoding time of CKAN responses by endpoint")
+frame_seconds     = Histogram("opendata_frame_build_seconds", "Time to turn a page of records into a typed DataFrame")
+frame_rows        = Counter("opendata_frame_rows_total", "Records turned into DataFrame rows")
+fetch_seconds     = Histogram("opendata_fetch_seconds", "Duration of whole fetches by kind (datastore, sql, store)")
+fetch_peak_bytes  = Histogram("opendata_fetch_peak_bytes", "DataFrame memory held at the peak of each in-memory fetch",
+                              BYTES_BUCKETS)
+serialize_seconds = Histogram("opendata_serialize_seconds", "Export serialization time by format")
+serialize_bytes   = Counter("opendata_serialized_bytes_total", "Export bytes written by format")
+cache_lookups     = Counter("opendata_cache_lookups_total", "Cache lookups by cache and result")
+flights           = Counter("opendata_flights_total", "Loads by role: started a fetch (leader), joined one in flight "
+                              "(follower), or left by every waiter before it finished (cancelled)")
+peak_rss          = Gauge("opendata_process_peak_rss_bytes", "Peak resident memory of the process", fn=peak_rss_bytes)
+
+
+def render():
+    """Every metric in the Prometheus text exposition format."""
+    out = []
+    for metric in REGISTRY:
+        samples = metric.samples()
+        out.append(f"# HELP {metric.name} {metric.help}")
+        out.append(f"# TYPE {metric.name} {metric.kind}")
+        out.extend(f"{name}{format_labels(labels)} {value}" for name, labels, value in samples if value is not None)
+    return "\n".join(out) + "\n"
+
+def summary():
+    """
+    Headline figures for the admin panel and the log sink: per-endpoint
+    requests, latency quantiles, bytes, retries and 429s; hit ratio per
+    cache; serialization and fetch peaks.
+    """
+    endpoints = {}
+    for key, n in http_requests.values().items():
+        labels = dict(key)
+        row = endpoints.setdefault(labels["endpoint"], {"endpoint": labels["endpoint"], "requests": 0,
+                                                        "errors": 0, "throttled": 0, "retries": 0})
+        row["requests"] += n
+        if labels["status"] == "429": row["throttled"] += n
+        if labels["status"] == "error" or labels["status"] >= "500": row["errors"] += n
+    for key, n in http_retries.values().items():
+        endpoint = dict(key)["endpoint"]
+        if endpoint in endpoints: endpoints[endpoint]["retries"] += n
+    for key, n in http_bytes.values().items():
+        endpoint = dict(key)["endpoint"]
+        if endpoint in endpoints: endpoints[endpoint]["bytes"] = n
+    for key, state in http_seconds.stats().items():
+        endpoint = dict(key)["endpoint"]
+        if endpoint in endpoints:
+            endpoints[endpoint]["p50_s"] = http_seconds.quantile(0.5, state)
+            endpoints[endpoint]["p95_s"] = http_seconds.quantile(0.95, state)
+    caches = {}
+    for key, n in cache_lookups.values().items():
+        labels = dict(key)
+        entry  = caches.setdefault(labels["cache"], {"lookups": 0, "hits": 0})
+        entry["lookups"] += n
+        if labels["result"] in ("hit", "fresh", "revalidated", "refresh"): entry["hits"] += n
+    for entry in caches.values():
+        entry["hit_ratio"] = entry["hits"] / entry["lookups"] if entry["lookups"] else None
+    peaks = [fetch_peak_bytes.quantile(1.0, s) for s in fetch_peak_bytes.stats().values()]
+    return {
+        "endpoints":      sorted(endpoints.values(), key=lambda r: -r["requests"]),
+        "caches":         caches,
+        "frame_rows":     sum(frame_rows.values().values()),
+        "flights":        {dict(k)["role"]: n for k, n in flights.values().items()},
+        "serialized":     {dict(k)["format"]: n for k, n in serialize_bytes.values().items()},
+        "fetch_peak_max": max(peaks, default=None),
+        "peak_rss":       peak_rss_bytes(),
+    }
+
+def log_summary(level=logging.INFO):
+    s = summary()
+    for row in s["endpoints"]:
+        log.log(level, "%(endpoint)s: %(requests)d requests, %(errors)d errors, %(throttled)d throttled, "
+                "%(retries)d retries, p50 %(p50)s s, p95 %(p95)s s",
+                {**row, "p50": row.get("p50_s"), "p95": row.get("p95_s")})
+    for name, entry in s["caches"].items():
+        log.log(level, "%s cache: %d lookups, hit ratio %.2f", name, entry["lookups"], entry["hit_ratio"] or 0)
+    if s["peak_rss"]:
+        log.log(level, "peak RSS %.1f MB", s["peak_rss"] / 1024 ** 2)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+_started      = set()
+_started_lock = threading.Lock()
+
+def start_http_server(port, addr="127.0.0.1"):
+    """
+    Serve /metrics from a daemon thread, on loopback unless `addr` says
+    otherwise ("" or "0.0.0.0" for every interface). Returns False if the
+    port is taken.
+    """
+    try:
+        server = ThreadingHTTPServer((addr, port), MetricsHandler)
+    except OSError as e:
+        log.warning("metrics endpoint not started on port %s: %s", port, e)
+        return False
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+    log.info("metrics served on http://%s:%d/metrics", addr or "0.0.0.0", port)
+    return True
+
+def start_log_sink(interval):
+    """Log a summary every `interval` seconds from a daemon thread."""
+    def loop():
+        while True:
+            time.sleep(interval)
+            log_summary()
+    threading.Thread(target=loop, daemon=True, name="metrics-log").start()
+
+def serve_from_env():
+    """Start the endpoint (METRICS_PORT) and log sink (METRICS_LOG_INTERVAL) that are configured, once per process."""
+    with _started_lock:
+        if config.METRICS_PORT and "http" not in _started:
+            _started.add("http")
+            start_http_server(config.METRICS_PORT, config.METRICS_ADDR)
+        if config.METRICS_LOG_INTERVAL and "log" not in _started:
+            _started.add("log")
+            start_log_sink(config.METRICS_LOG_INTERVAL)
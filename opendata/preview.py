@@ -0,0 +1,184 @@
+"""
+File-based previews for resources outside the datastore: the first rows of
+a CSV, spreadsheet or JSON/GeoJSON file, parsed while the file streams in
+so a large file is never downloaded or parsed in full just to look at it.
+"""
+import io
+import json
+import logging
+from contextlib import contextmanager
+from itertools import islice
+
+import pandas as pd
+import requests
+
+from . import config
+from .api import FetchError, http_get
+from .compact import compact_frame
+from .files import shared_file_cache
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+try:
+    import xlrd
+except ImportError:
+    xlrd = None
+
+log = logging.getLogger(__name__)
+
+PREVIEW_FORMATS = {"CSV", "TSV", "XLS", "XLSX", "JSON", "GEOJSON"}
+HEAD_BYTES      = 64 * 1024
+
+
+class PreviewUnavailable(Exception):
+    """The format needs an optional package that is not installed; args[0] names it."""
+
+
+class ChunkStream(io.RawIOBase):
+    """A readable file over an iterator of byte chunks, such as Response.iter_content."""
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._buffer = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buffer:
+            self._buffer = next(self._chunks, None)
+            if self._buffer is None:
+                self._buffer = b""
+                return 0
+        n = min(len(b), len(self._buffer))
+        b[:n], self._buffer = self._buffer[:n], self._buffer[n:]
+        return n
+
+
+@contextmanager
+def open_stream(url):
+    """The resource body as a binary file: the cached copy when there is one, else the live response."""
+    path = shared_file_cache().cached_path(url)
+    if path is not None:
+        with open(path, "rb") as f:
+            yield f
+        return
+    try:
+        resp = http_get(url, endpoint="download", stream=True)
+        resp.raise_for_status()
+    except requests.RequestException as e:
+        raise FetchError(f"download failed for {url}: {e}") from e
+    with resp:
+        yield io.BufferedReader(ChunkStream(resp.iter_content(HEAD_BYTES)), buffer_size=HEAD_BYTES)
+
+def cached_file(url):
+    """Formats that need random access are spooled to the file cache in full."""
+    return shared_file_cache().fetch(url)
+
+
+def flatten(record):
+    """GeoJSON features become their properties plus the geometry as GeoJSON text."""
+    if isinstance(record, dict) and record.get("type") == "Feature":
+        geometry = record.get("geometry")
+        return {**(record.get("properties") or {}),
+                "geometry": json.dumps(geometry) if geometry is not None else None}
+    return record if isinstance(record, dict) else {"value": record}
+
+def records_prefix(head: bytes):
+    """ijson prefix of the first array of objects near the top of a document: "item", "features.item"…"""
+    try:
+        for prefix, event, _ in ijson.parse(io.BytesIO(head)):
+            if event == "start_map" and (prefix == "item" or prefix.endswith(".item")) and prefix.count(".") <= 1:
+                return prefix
+    except ijson.common.IncompleteJSONError:
+        pass
+    return None
+
+def find_records(doc):
+    """The record list of a parsed document: the document itself, GeoJSON features, or the first list of objects."""
+    if isinstance(doc, list):
+        return doc
+    if isinstance(doc, dict):
+        if isinstance(doc.get("features"), list):
+            return doc["features"]
+        for value in doc.values():
+            if isinstance(value, list) and value and isinstance(value[0], dict):
+                return value
+        return [doc]
+    return []
+
+def preview_json(url, max_rows):
+    if ijson is None:
+        # Without ijson the whole document has to be parsed; spool it through the file cache first.
+        log.warning("ijson is not installed: downloading and parsing all of %s to preview it", url)
+        with open(cached_file(url), "rb") as f:
+            records = find_records(json.load(f))[:max_rows]
+        return pd.DataFrame.from_records([flatten(r) for r in records])
+    with open_stream(url) as stream:
+        head   = stream.peek(HEAD_BYTES)
+        prefix = records_prefix(head) or ("item" if head.lstrip()[:1] == b"[" else "features.item")
+        items  = ijson.items(stream, prefix, use_float=True)
+        return pd.DataFrame.from_records([flatten(r) for r in islice(items, max_rows)])
+
+def preview_csv(url, max_rows, sep):
+    with open_stream(url) as stream:
+        text = io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace", newline="")
+        return pd.read_csv(text, sep=sep, engine="python" if sep is None else "c", nrows=max_rows)
+
+def sheet_frame(rows):
+    header = next(rows, None)
+    if header is None:
+        return pd.DataFrame()
+    columns = [str(h) if h is not None and str(h).strip() else f"column_{i + 1}" for i, h in enumerate(header)]
+    return pd.DataFrame.from_records(list(rows), columns=columns)
+
+def preview_xlsx(url, max_rows):
+    if openpyxl is None:
+        raise PreviewUnavailable("openpyxl")
+    # XLSX is a zip archive whose directory sits at the end, so the file is spooled first.
+    # openpyxl checks file names for an .xlsx suffix, which cache entries lack; hand it the open file.
+    with open(cached_file(url), "rb") as f:
+        book = openpyxl.load_workbook(f, read_only=True, data_only=True)
+        try:
+            rows = book.worksheets[0].iter_rows(values_only=True)
+            return sheet_frame(islice(rows, max_rows + 1))
+        finally:
+            book.close()
+
+def preview_xls(url, max_rows):
+    if xlrd is None:
+        raise PreviewUnavailable("xlrd")
+    book = xlrd.open_workbook(str(cached_file(url)), on_demand=True)
+    try:
+        sheet = book.sheet_by_index(0)
+        rows  = (sheet.row_values(i) for i in range(min(sheet.nrows, max_rows + 1)))
+        return sheet_frame(rows)
+    finally:
+        book.release_resources()
+
+def preview_file(url, fmt, max_rows=None):
+    """
+    The first `max_rows` (default FILE_PREVIEW_ROWS) rows of a CSV, TSV,
+    XLS, XLSX, JSON or GeoJSON file, compacted. Only the first sheet of a
+    workbook is read. Raises FetchError if the file cannot be downloaded
+    or parsed and PreviewUnavailable if the format needs a missing package.
+    """
+    max_rows = max_rows or config.FILE_PREVIEW_ROWS
+    fmt      = fmt.upper()
+    if fmt not in PREVIEW_FORMATS:
+        raise ValueError(f"no file preview for {fmt}")
+    try:
+        if fmt in ("JSON", "GEOJSON"): df = preview_json(url, max_rows)
+        elif fmt == "XLSX":            df = preview_xlsx(url, max_rows)
+        elif fmt == "XLS":             df = preview_xls(url, max_rows)
+        else:                          df = preview_csv(url, max_rows, "\t" if fmt == "TSV" else None)
+    except (FetchError, PreviewUnavailable):
+        raise
+    except Exception as e:      # a file that does not parse as its declared format
+        raise FetchError(f"could not read {url} as {fmt}: {e}") from e
+    return compact_frame(df) if not df.empty else df
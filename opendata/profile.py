@@ -0,0 +1,129 @@
+"""
+Column statistics for a fetched frame, computed in one pass and kept with
+it: null counts, HyperLogLog distinct estimates, min/max, top values.
+"""
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+TOP_VALUES = 3
+
+
+class HyperLogLog:
+    """
+    Distinct-count sketch over 64-bit hashes, 2**p one-byte registers
+    (p=14: 16 KiB, about 0.8% standard error). Small counts fall back to
+    linear counting, so low-cardinality columns come out near exact.
+    """
+    def __init__(self, p: int = 14):
+        self.p         = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+
+    def add(self, hashes: np.ndarray):
+        if not len(hashes): return
+        hashes = hashes.astype(np.uint64, copy=False)
+        index  = (hashes >> np.uint64(64 - self.p)).astype(np.intp)
+        rest   = hashes << np.uint64(self.p)
+        # Leading zeros of `rest` by binary search, vectorized.
+        zeros  = np.zeros(len(rest), dtype=np.uint8)
+        for shift in (32, 16, 8, 4, 2, 1):
+            top = rest < np.uint64(1 << (64 - shift))
+            zeros[top] += shift
+            rest[top] <<= np.uint64(shift)
+        rank = np.minimum(zeros + 1, 64 - self.p + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def count(self) -> int:
+        m     = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw   = alpha * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(np.int32)))
+        empty = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and empty:
+            return int(round(m * np.log(m / empty)))
+        return int(round(raw))
+
+
+def hash_values(values: pd.Series) -> np.ndarray:
+    try:
+        return pd.util.hash_pandas_object(values, index=False).to_numpy()
+    except TypeError:      # unhashable cells (dicts, lists) hash by their text
+        return pd.util.hash_pandas_object(values.astype(str), index=False).to_numpy()
+
+
+class ColumnProfiler:
+    """Statistics for one column, accumulated over any number of chunks."""
+    def __init__(self, name, dtype):
+        self.name   = name
+        self.dtype  = dtype
+        self.rows   = 0
+        self.nulls  = 0
+        self.min    = None
+        self.max    = None
+        self.sample = None
+        self.hll    = HyperLogLog()
+        self.counts = Counter()
+        self._ordered = True
+
+    def add(self, series: pd.Series):
+        self.rows  += len(series)
+        values      = series.dropna()
+        self.nulls += len(series) - len(values)
+        if values.empty: return
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype(values.cat.categories.dtype)
+        if self.sample is None: self.sample = values.iloc[0]
+        self.hll.add(hash_values(values))
+        if self._ordered:
+            try:
+                lo, hi   = values.min(), values.max()
+                self.min = lo if self.min is None else min(self.min, lo)
+                self.max = hi if self.max is None else max(self.max, hi)
+            except TypeError:      # mixed types have no order
+                self._ordered, self.min, self.max = False, None, None
+        try:
+            counts = values.value_counts(sort=False).to_dict()
+        except TypeError:
+            counts = values.astype(str).value_counts(sort=False).to_dict()
+        self.counts.update(counts)
+        # Keep the heaviest values only, so high-cardinality columns stay bounded.
+        if len(self.counts) > 1_000:
+            self.counts = Counter(dict(self.counts.most_common(100)))
+
+    def result(self):
+        distinct = min(self.hll.count(), self.rows - self.nulls)
+        return {
+            "column":   self.name,
+            "dtype":    self.dtype,
+            "non_null": self.rows - self.nulls,
+            "nulls":    self.nulls,
+            "distinct": distinct,
+            "min":      self.min,
+            "max":      self.max,
+            "top":      [(v, n) for v, n in self.counts.most_common(TOP_VALUES) if n > 1],
+            "sample":   self.sample,
+        }
+
+
+def profile_chunks(chunks, dtypes):
+    """Profile an iterable of DataFrame chunks sharing the columns in `dtypes` ({column: dtype name})."""
+    profilers = {col: ColumnProfiler(col, dtype) for col, dtype in dtypes.items()}
+    rows = 0
+    for chunk in chunks:
+        rows += len(chunk)
+        for col, profiler in profilers.items():
+            profiler.add(chunk[col])
+    return {"rows": rows, "columns": [p.result() for p in profilers.values()]}
+
+def profile_frame(df: pd.DataFrame):
+    """Profile an in-memory frame, with its deep memory footprint."""
+    profile = profile_chunks([df], df.dtypes.astype(str).to_dict())
+    profile["memory"] = int(df.memory_usage(deep=True).sum())
+    return profile
+
+def profile_store(store):
+    """Profile a DiskFrame batch by batch; `memory` is its size on disk."""
+    dtypes  = {f.name: str(f.type) for f in store.schema} if store.schema is not None else {}
+    profile = profile_chunks((batch.to_pandas() for batch in store.iter_batches()), dtypes)
+    profile["memory"] = store.nbytes
+    return profile
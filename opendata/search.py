@@ -0,0 +1,118 @@
+"""
+In-memory indexes: catalog search for the browser and the row filter.
+"""
+import re
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+import pandas as pd
+
+
+def fold_text(text: str) -> str:
+    """
+    Lower-case, spell out œ and æ (which NFKD leaves whole) and strip
+    accents, so French text matches with or without them.
+    """
+    lowered    = text.lower().replace("œ", "oe").replace("æ", "ae")
+    decomposed = unicodedata.normalize("NFKD", lowered)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+def tokenize(text: str) -> list:
+    return re.findall(r"\w+", fold_text(text))
+
+def package_title(pkg) -> str:
+    return pkg.get("title") or pkg.get("name") or "N/A"
+
+
+class CatalogIndex:
+    """
+    Inverted index over the catalog, built once per catalog refresh.
+    Every query token must match a word prefix; packages are ranked by
+    field weight (title, then resource names, then description), ties
+    keeping the catalog's most-recently-modified order.
+    """
+    FIELD_WEIGHTS = {"title": 3.0, "resources": 2.0, "notes": 1.0}
+
+    def __init__(self, packages):
+        self.packages  = packages
+        self.by_id     = {}
+        self.by_title  = {}
+        self.summaries = []
+        postings = defaultdict(dict)
+        for i, pkg in enumerate(packages):
+            title = package_title(pkg)
+            org   = pkg.get("organization") or {}
+            self.by_id.setdefault(pkg.get("id"), pkg)
+            self.by_title.setdefault(title, pkg)
+            self.summaries.append((
+                title,
+                org.get("title", "N/A") if isinstance(org, dict) else "N/A",
+                len(pkg.get("resources", [])),
+                (pkg.get("metadata_modified") or "")[:10],
+            ))
+            texts = {
+                "title":     title,
+                "resources": " ".join(r.get("name") or "" for r in pkg.get("resources", [])),
+                "notes":     pkg.get("notes") or "",
+            }
+            for field, weight in self.FIELD_WEIGHTS.items():
+                for token in set(tokenize(texts[field])):
+                    postings[token][i] = postings[token].get(i, 0.0) + weight
+        self._postings = dict(postings)
+        self._vocab    = sorted(postings)
+
+    def _token_scores(self, token):
+        scores = {}
+        pos    = bisect_left(self._vocab, token)
+        while pos < len(self._vocab) and self._vocab[pos].startswith(token):
+            word   = self._vocab[pos]
+            factor = 1.0 if word == token else 0.5
+            for i, weight in self._postings[word].items():
+                scores[i] = max(scores.get(i, 0.0), weight * factor)
+            pos += 1
+        return scores
+
+    def search(self, query):
+        """Positions of the packages matching every query token, best first."""
+        tokens = tokenize(query)
+        if not tokens:
+            return list(range(len(self.packages)))
+        scores = None
+        for token in dict.fromkeys(tokens):
+            hits   = self._token_scores(token)
+            scores = hits if scores is None else {i: s + hits[i] for i, s in scores.items() if i in hits}
+            if not scores: return []
+        return sorted(scores, key=lambda i: (-scores[i], i))
+
+
+class SearchIndex:
+    """
+    Lower-cased text of every row, built once per fetched frame, so the row
+    filter is a single vectorized substring scan instead of re-stringifying
+    every column on each rerun. Per-column text is built on first use.
+    """
+    SEP = "\x1f"
+
+    def __init__(self, df):
+        self._df      = df
+        self._columns = {}
+        text = None
+        for col in df.columns:
+            col_text = self._lower_text(df[col])
+            text     = col_text if text is None else text + self.SEP + col_text
+        self.text = text if text is not None else pd.Series("", index=df.index)
+
+    @staticmethod
+    def _lower_text(series):
+        return series.astype(str).str.lower().where(series.notna(), "")
+
+    def column(self, col):
+        if col not in self._columns:
+            self._columns[col] = self._lower_text(self._df[col])
+        return self._columns[col]
+
+    def mask(self, term, column=None):
+        """Boolean mask of rows containing `term` (literal, case-insensitive)."""
+        text = self.column(column) if column is not None else self.text
+        return text.str.contains(term.lower(), regex=False).to_numpy(dtype=bool)
@@ -0,0 +1,208 @@
+"""
+Out-of-core mode: resources streamed page by page to Parquet parts on disk
+and queried lazily, so a fetch never has to fit in memory.
+"""
+import shutil
+import threading
+import time
+import uuid
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pcsv
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from . import config, metrics
+from .api import stream_records, stream_sql_records
+from .compact import drop_id
+from .export import open_csv
+
+BATCH_ROWS    = 64_000
+STORE_FORMATS = ["csv", "csv.gz", "parquet", "feather"]    # GeoParquet needs the frame in memory
+
+
+class DiskFrame:
+    """
+    A fetched resource held as Parquet parts under CACHE_DIR/stores, one per
+    page, named by row offset. Pages are appended as they arrive; every read
+    scans the parts in row order and materializes only what it returns.
+    """
+    def __init__(self, root: Path):
+        self.root    = root
+        self.schema  = None
+        self._rows   = {}      # part path -> row count
+        self._lock   = threading.Lock()
+        root.mkdir(parents=True, exist_ok=True)
+
+    def append(self, offset, chunk):
+        """Write one page. Text columns are stored as strings and later parts are cast to the first part's schema."""
+        chunk = drop_id(chunk)
+        text  = chunk.select_dtypes(include="object").columns
+        chunk = chunk.astype({c: "string" for c in text})
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        with self._lock:
+            if self.schema is None:
+                self.schema = table.schema.remove_metadata()
+            table = table.cast(self.schema)
+            path  = self.root / f"part-{offset:012d}.parquet"
+            pq.write_table(table, path)
+            self._rows[path] = table.num_rows
+
+    def _parts(self):
+        with self._lock:
+            return sorted(self._rows), dict(self._rows)
+
+    @property
+    def columns(self):
+        return list(self.schema.names) if self.schema is not None else []
+
+    @property
+    def num_rows(self):
+        return sum(self._parts()[1].values())
+
+    @property
+    def empty(self):
+        return self.num_rows == 0
+
+    @property
+    def nbytes(self):
+        return sum(path.stat().st_size for path in self._parts()[0] if path.exists())
+
+    def dataset(self):
+        return ds.dataset([str(p) for p in self._parts()[0]], schema=self.schema, format="parquet")
+
+    def iter_batches(self, columns=None):
+        if self.schema is None: return
+        yield from self.dataset().to_batches(columns=columns, batch_size=BATCH_ROWS)
+
+    def window(self, start, stop):
+        """Rows [start, stop) as a DataFrame, reading only the parts that overlap them."""
+        paths, rows = self._parts()
+        tables, pos = [], 0
+        for path in paths:
+            n = rows[path]
+            if pos + n > start and pos < stop:
+                lo, hi = max(start - pos, 0), min(stop - pos, n)
+                tables.append(pq.read_table(path).slice(lo, hi - lo))
+            pos += n
+            if pos >= stop: break
+        if not tables:
+            return self.schema.empty_table().to_pandas() if self.schema is not None else pd.DataFrame()
+        return pa.concat_tables(tables).to_pandas()
+
+    def head(self, n):
+        return self.window(0, n)
+
+    def filter(self, term, column=None, limit=1_000):
+        """
+        Rows containing `term` (literal, case-insensitive) in `column` or any
+        column: (first `limit` matches as a DataFrame, total match count).
+        """
+        columns = [column] if column is not None else self.columns
+        found, matches, kept = [], 0, 0
+        for batch in self.iter_batches():
+            mask = None
+            for name in columns:
+                values = batch.column(name)
+                if not (pa.types.is_string(values.type) or pa.types.is_large_string(values.type)):
+                    values = pc.cast(values, pa.string())
+                hit  = pc.fill_null(pc.match_substring(values, term, ignore_case=True), False)
+                mask = hit if mask is None else pc.or_(mask, hit)
+            if mask is None: break
+            count    = pc.sum(mask).as_py() or 0
+            matches += count
+            if count and kept < limit:
+                rows  = batch.filter(mask).slice(0, limit - kept)
+                kept += rows.num_rows
+                found.append(rows)
+        if not found:
+            return self.head(0), matches
+        return pa.Table.from_batches(found).to_pandas(), matches
+
+    def write(self, path, fmt, compression=None):
+        """Stream every part into one export file, a batch at a time."""
+        with metrics.serialize_seconds.time(format=fmt):
+            self._write(path, fmt, None if compression == "none" else compression)
+        metrics.serialize_bytes.inc(Path(path).stat().st_size, format=fmt)
+
+    def _write(self, path, fmt, compression):
+        if fmt in ("csv", "csv.gz"):
+            with open_csv(path, "gzip" if fmt == "csv.gz" else None) as sink, \
+                    pcsv.CSVWriter(sink, self.schema) as writer:
+                for batch in self.iter_batches(): writer.write_batch(batch)
+        elif fmt == "parquet":
+            with pq.ParquetWriter(path, self.schema, compression=compression or "none") as writer:
+                for batch in self.iter_batches(): writer.write_batch(batch)
+        elif fmt == "feather":
+            with pa.ipc.new_file(path, self.schema) as writer:
+                for batch in self.iter_batches(): writer.write_batch(batch)
+        else:
+            raise ValueError(f"{fmt} export is not available for out-of-core frames")
+
+    def keep_head(self):
+        """
+        Delete the parts after the first missing offset, as an interrupted
+        fetch leaves pages that landed out of order. Returns the rows kept.
+        """
+        with self._lock:
+            paths, end = sorted(self._rows), None
+            for i, path in enumerate(paths):
+                offset = int(path.stem.rsplit("-", 1)[1])
+                if end is not None and offset != end:
+                    for gone in paths[i:]:
+                        del self._rows[gone]
+                        gone.unlink(missing_ok=True)
+                    break
+                end = offset + self._rows[path]
+            return sum(self._rows.values())
+
+    def discard(self):
+        with self._lock:
+            shutil.rmtree(self.root, ignore_errors=True)
+            self._rows = {}
+
+
+
+def store_writer(fmt, compression=None):
+    """The (store, path) writer for a FrameExport of a DiskFrame."""
+    return lambda store, path: store.write(path, fmt, compression)
+
+
+def new_store():
+    """An empty DiskFrame under CACHE_DIR/stores; stores older than STORE_MAX_AGE are removed first."""
+    store_dir = config.CACHE_DIR / "stores"
+    store_dir.mkdir(parents=True, exist_ok=True)
+    cutoff = time.time() - config.STORE_MAX_AGE
+    for old in store_dir.iterdir():
+        if old.stat().st_mtime < cutoff: shutil.rmtree(old, ignore_errors=True)
+    return DiskFrame(store_dir / uuid.uuid4().hex)
+
+def fetch_to_store(resource_id, max_rows=None, query=None, progress=None, preview=None):
+    """
+    Stream a resource (or a server-side query's result) into a new DiskFrame
+    without ever holding more than a page in memory. Bypasses the resource
+    cache, which stores whole frames. `preview(store)` is called after each
+    round of pages; a caller given the store owns it if the fetch is then
+    interrupted (a Streamlit rerun, Ctrl-C), and can keep its head with
+    keep_head(). Raises FetchError if the portal fails.
+    """
+    store = new_store()
+
+    def report(fetched, total):
+        if progress: progress(fetched, total)
+        if preview:  preview(store)
+
+    try:
+        with metrics.fetch_seconds.time(kind="store"):
+            if query and "sql" in query:
+                stream_sql_records(query["sql"], store.append, max_rows=max_rows, progress=report)
+            else:
+                stream_records(resource_id, store.append, max_rows=max_rows, query=query, progress=report)
+    except BaseException as e:
+        if preview is None or isinstance(e, Exception):
+            store.discard()
+        raise
+    return store
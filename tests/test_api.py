@@ -0,0 +1,26 @@
+import pandas as pd
+
+from opendata.api import records_to_frame, top_level_order
+
+
+def test_big_integers_survive_a_null():
+    df = records_to_frame([{"n": 9007199254740993}, {"n": None}], [{"id": "n", "type": "int8"}])
+    assert str(df["n"].dtype) == "Int64"
+    assert df["n"].iloc[0] == 9007199254740993
+
+def test_numeric_text_too_long_for_float_stays_text():
+    df = records_to_frame([{"n": "12345678901234567.5"}, {"n": None}], [{"id": "n", "type": "numeric"}])
+    assert df["n"].iloc[0] == "12345678901234567.5"
+
+def test_numeric_that_fits_is_converted():
+    df = records_to_frame([{"n": "1.25"}, {"n": 2.5}, {"n": None}], [{"id": "n", "type": "numeric"}])
+    assert pd.api.types.is_float_dtype(df["n"])
+    assert df["n"].tolist()[:2] == [1.25, 2.5]
+
+def test_order_by_inside_parentheses_is_not_the_statements():
+    assert top_level_order('SELECT a, rank() OVER (ORDER BY b) FROM "r"') is None
+    assert top_level_order('WITH x AS (SELECT * FROM "r" ORDER BY a) SELECT * FROM x') is None
+    assert top_level_order("SELECT 'order by a' FROM \"r\" -- order by b") is None
+
+def test_top_level_order_stops_before_limit():
+    assert top_level_order('SELECT * FROM "r" ORDER BY "Date" DESC, 2 LIMIT 10') == '"Date" DESC, 2'
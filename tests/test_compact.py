@@ -0,0 +1,45 @@
+import pandas as pd
+
+from opendata.compact import compact_frame, drop_columns, head_rows, infer_text
+
+
+def test_mixed_utc_offsets_convert_to_utc():
+    series = pd.Series(["2023-01-15T08:30:00-05:00", "2023-07-15T08:30:00-04:00", None])
+    dates  = infer_text(series)
+    assert str(dates.dt.tz) == "UTC"
+    assert dates[0] == pd.Timestamp("2023-01-15T13:30:00Z")
+    assert dates[1] == pd.Timestamp("2023-07-15T12:30:00Z")
+    assert dates.isna()[2]
+
+def test_mixed_offsets_do_not_break_compact_frame():
+    df = pd.DataFrame({"date": ["2023-01-15T08:30:00-05:00", "2023-07-15T08:30:00-04:00"]})
+    assert pd.api.types.is_datetime64_any_dtype(compact_frame(df)["date"])
+
+def test_mixed_naive_and_offset_timestamps_stay_text():
+    assert infer_text(pd.Series(["2023-01-15T08:30:00", "2023-07-15T08:30:00-04:00"])) is None
+
+def test_long_digit_strings_stay_text():
+    assert infer_text(pd.Series(["123456789012345678901234", "1"])) is None
+    assert infer_text(pd.Series(["12345678901234567", None])) is None
+    assert infer_text(pd.Series(["3.14159265358979323846", "1.5"])) is None
+
+def test_leading_zeros_past_the_sample_stay_text():
+    codes = pd.Series([str(i) for i in range(1000, 2500)] + ["00042"])
+    assert infer_text(codes) is None
+    assert compact_frame(pd.DataFrame({"code": codes}))["code"].iloc[-1] == "00042"
+
+def test_numbers_that_fit_are_converted():
+    assert infer_text(pd.Series(["12345678901234567", "1"])).tolist() == [12345678901234567, 1]
+    assert infer_text(pd.Series(["1.25", "-3e5", None])).tolist()[:2] == [1.25, -300000.0]
+
+def test_head_drops_whole_frame_memory_figures():
+    df = compact_frame(pd.DataFrame({"a": [str(i) for i in range(100)]}))
+    assert "memory_before" in df.attrs
+    assert "memory_before" not in head_rows(df, 10).attrs
+    assert head_rows(df, 100).attrs["memory_before"] == df.attrs["memory_before"]
+
+def test_drop_columns_restates_memory_figures():
+    df   = compact_frame(pd.DataFrame({"_id": range(100), "name": [f"row {i}" for i in range(100)]}))
+    kept = drop_columns(df, ["_id"])
+    assert kept.attrs["memory_before"] < df.attrs["memory_before"]
+    assert kept.attrs["memory_after"] == int(kept.memory_usage(deep=True).sum())
@@ -0,0 +1,10 @@
+from opendata.search import CatalogIndex, fold_text
+
+
+def test_fold_text_spells_out_ligatures():
+    assert fold_text("Œuvres d'art, Lætitia, élève") == "oeuvres d'art, laetitia, eleve"
+
+def test_catalog_search_matches_ligatures_either_way():
+    index = CatalogIndex([{"id": "1", "title": "Œuvres d'art public"}])
+    assert index.search("oeuvres") == [0]
+    assert index.search("œuvre") == [0]